@@ -0,0 +1,100 @@
+'''
+Offline microbenchmarks for the bot's utilities.
+
+Run from the repository root with `python bench`, results are printed as JSON.
+`--save` stores them as the baseline, later runs are compared against it and
+exit with a non-zero status if any benchmark got slower than the tolerance.
+'''
+import argparse
+import json
+import os
+import platform
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bot'))
+
+import encoder_bench
+import menu_bench
+import queue_bench
+from timing import Result
+
+
+BASELINE_PATH = 'bench/baseline.json'
+SUITES = {
+    'queue': queue_bench,
+    'menu': menu_bench,
+    'encoder': encoder_bench
+}
+QUICK_SIZES = {
+    'queue': (10, 1_000, 100_000),
+    'menu': (1_000, 100_000),
+    'encoder': (32, 64, 128)
+}
+
+
+def compare(
+    results: dict[str, float],
+    baseline: dict[str, float],
+    tolerance: float
+) -> list[str]:
+    """Return the keys of results which are slower than the baseline by more than `tolerance`."""
+    return [
+        key for key, seconds in results.items()
+        if key in baseline and seconds > baseline[key] * (1 + tolerance)
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog='python bench', description=__doc__)
+    parser.add_argument('--only', choices=SUITES, action='append', help='Only run these suites')
+    parser.add_argument('--quick', action='store_true', help='Skip the largest sizes')
+    parser.add_argument('--output', help='Also write the results to this file')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='The baseline file')
+    parser.add_argument('--save', action='store_true', help='Store the results as the baseline')
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.25,
+        help='Allowed slowdown relative to the baseline, 0.25 = 25%%'
+    )
+    args = parser.parse_args()
+
+    results: list[Result] = []
+    for name in args.only or SUITES:
+        suite = SUITES[name]
+        results += suite.run(QUICK_SIZES[name]) if args.quick else suite.run()
+    timings = {result.key: result.seconds for result in results}
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': timings
+    }
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=4)
+
+    if args.save:
+        with open(args.baseline, 'w') as baseline_json:
+            json.dump(report, baseline_json, indent=4)
+        print(f'saved baseline to {args.baseline}', file=sys.stderr)
+        return 0
+    try:
+        with open(args.baseline, 'r') as baseline_json:
+            baseline = json.load(baseline_json)['results']
+    except FileNotFoundError:
+        print(f'no baseline at {args.baseline}, run with --save to create one', file=sys.stderr)
+        return 0
+
+    regressions = compare(timings, baseline, args.tolerance)
+    for key in regressions:
+        print(
+            f'REGRESSION {key}: {timings[key] * 1e6:.3f}us '
+            f'(baseline {baseline[key] * 1e6:.3f}us)',
+            file=sys.stderr
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
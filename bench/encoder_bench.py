@@ -0,0 +1,66 @@
+import math
+import random
+import struct
+import sys
+from typing import Iterator
+from discord import opus
+from discord.opus import Encoder as OpusEncoder
+from timing import Result, measure
+from utils import EncoderSettings
+
+
+__all__ = [
+    'run'
+]
+
+
+# voice channel bitrates in kbps, sizes of the results
+SIZES = (8, 32, 64, 96, 128, 384)
+FRAMES = 50
+
+
+def _frames() -> list[bytes]:
+    # a chord with some noise, encoders take shortcuts on pure tones and silence
+    rng = random.Random(0)
+    frames, sample = [], 0
+    for _ in range(FRAMES):
+        values = []
+        for _ in range(OpusEncoder.SAMPLES_PER_FRAME):
+            time = sample / OpusEncoder.SAMPLING_RATE
+            value = sum(
+                3000 * math.sin(2 * math.pi * frequency * time)
+                for frequency in (220.0, 277.2, 329.6, 440.0)
+            ) + rng.uniform(-1500, 1500)
+            values += (int(value),) * OpusEncoder.CHANNELS
+            sample += 1
+        frames.append(struct.pack(f'<{len(values)}h', *values))
+    return frames
+
+
+def _encode(encoder: OpusEncoder, frames: list[bytes]) -> None:
+    for frame in frames:
+        encoder.encode(frame, OpusEncoder.SAMPLES_PER_FRAME)
+
+
+def _benchmarks(kbps: int, frames: list[bytes]) -> Iterator[Result]:
+    settings = EncoderSettings.for_bitrate(kbps * 1000)
+    variants = {
+        'channel': settings,
+        'default': EncoderSettings(),
+        'complexity0': settings.with_complexity(0)
+    }
+    for label, variant in variants.items():
+        encoder = OpusEncoder()
+        variant.apply(encoder)
+        # seconds per frame, multiplied by 50 frames a second it's the CPU used per stream
+        seconds = measure(lambda _: _encode(encoder, frames), repeat=5) / len(frames)
+        yield Result(f'encoder.frame.{label}', kbps, seconds)
+
+
+def run(sizes: tuple[int, ...] = SIZES) -> list[Result]:
+    """Run the opus encoder benchmarks for every channel bitrate."""
+    if not opus.is_loaded() and not opus._load_default():
+        print('libopus could not be loaded, skipping encoder benchmarks', file=sys.stderr)
+        return []
+    frames = _frames()
+    return [result for kbps in sizes for result in _benchmarks(kbps, frames)]
@@ -0,0 +1,225 @@
+'''
+Offline load test of many concurrent Players.
+
+Players send synthetic audio to stand-in voice clients which record when every
+packet was sent. For each guild count the run reports the CPU used per stream,
+the distribution of how late packets were sent and the amount of threads.
+
+Run from the repository root with `python bench/loadtest.py`.
+'''
+import argparse
+import asyncio
+import json
+import math
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from types import SimpleNamespace
+from typing import Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bot'))
+
+import discord
+from discord.opus import Encoder as OpusEncoder
+from plugins.music import Player, Song
+from utils import Queue, RepeatMode
+
+
+# an arbitrary opus packet, sources which are opus skip encoding
+OPUS_PACKET = b'\xfc' + bytes(159)
+# packets sent later than this are counted as late frames
+LATE_THRESHOLD = Player.DELAY / 2
+
+
+def _sine_frame(frequency: float = 440.0) -> bytes:
+    samples = OpusEncoder.SAMPLES_PER_FRAME
+    values = []
+    for index in range(samples):
+        value = int(8000 * math.sin(2 * math.pi * frequency * index / OpusEncoder.SAMPLING_RATE))
+        values += (value,) * OpusEncoder.CHANNELS
+    return struct.pack(f'<{len(values)}h', *values)
+
+
+class SyntheticSource(discord.AudioSource):
+    """
+    A source returning the same frame a fixed amount of times.
+
+    Parameters
+    ----------
+    frames: `int`
+        The amount of frames to return before ending
+    opus: `bool`
+        Whether to return an opus packet instead of PCM
+    """
+
+    PCM_FRAME = _sine_frame()
+
+    def __init__(self, frames: int, *, opus: bool = False) -> None:
+        self._remaining = frames
+        self._opus = opus
+        self._frame = OPUS_PACKET if opus else self.PCM_FRAME
+
+    def read(self) -> bytes:
+        if self._remaining <= 0:
+            return b''
+        self._remaining -= 1
+        return self._frame
+
+    def is_opus(self) -> bool:
+        return self._opus
+
+
+class FakeWebSocket:
+    async def speak(self, state: Any) -> None:
+        pass
+
+
+class FakeVoiceClient:
+    """
+    Stands in for `discord.VoiceClient`, recording when packets are sent.
+
+    Packets which need encoding are encoded with the client's encoder like
+    the real voice client does, but not sent anywhere.
+    """
+
+    def __init__(self, guild_id: int, loop: asyncio.AbstractEventLoop) -> None:
+        self.guild = SimpleNamespace(id=guild_id)
+        self.channel = SimpleNamespace(bitrate=64000, members=[])
+        self.loop = loop
+        self.ws = FakeWebSocket()
+        self.encoder = None
+        self._connected = threading.Event()
+        self._connected.set()
+        self.timestamps = array('d')
+
+    def send_audio_packet(self, data: bytes, *, encode: bool = True) -> None:
+        if encode:
+            self.encoder.encode(data, OpusEncoder.SAMPLES_PER_FRAME)
+        self.timestamps.append(time.perf_counter())
+
+    async def disconnect(self, *, force: bool = False) -> None:
+        self._connected.clear()
+
+    def lateness(self) -> list[float]:
+        """
+        How late every packet was sent in seconds.
+
+        Packets are compared to a perfect 20ms pace, aligned to the 1st
+        percentile of packet offsets so a constant startup delay or a few
+        early packets don't count as lateness.
+        """
+        offsets = [
+            stamp - index * Player.DELAY
+            for index, stamp in enumerate(self.timestamps)
+        ]
+        if not offsets:
+            return []
+        reference = sorted(offsets)[len(offsets) // 100]
+        return [max(0.0, offset - reference) for offset in offsets]
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    return values[max(0, min(len(values) - 1, round(percent / 100 * len(values)) - 1))]
+
+
+async def run_scenario(guilds: int, seconds: float, opus: bool) -> dict[str, Any]:
+    """Play `seconds` of audio to `guilds` fake voice clients at the same time."""
+    loop = asyncio.get_running_loop()
+    frames = int(seconds / Player.DELAY)
+    song = Song(
+        title='Synthetic',
+        channel_name='loadtest',
+        thumbnail='',
+        page_url='',
+        url='',
+        duration=int(seconds),
+        video_id='synthetic0'
+    )
+    clients = [FakeVoiceClient(guild_id, loop) for guild_id in range(guilds)]
+    players = [
+        Player(
+            client,
+            queue=Queue([song], repeat=RepeatMode.Off),
+            timeout=3600,
+            source_factory=lambda _: SyntheticSource(frames, opus=opus)
+        )
+        for client in clients
+    ]
+
+    threads = threading.active_count()
+    cpu, wall = time.process_time(), time.perf_counter()
+    for player in players:
+        player.play()
+    peak_threads = threads
+    while any(len(client.timestamps) < frames for client in clients):
+        peak_threads = max(peak_threads, threading.active_count())
+        await asyncio.sleep(0.1)
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+
+    for player in players:
+        player.shutdown()
+    # the next scenario starts with only its own threads
+    await loop.run_in_executor(None, lambda: [player.join() for player in players])
+
+    lateness = sorted(late for client in clients for late in client.lateness())
+    return {
+        'guilds': guilds,
+        'source': 'opus' if opus else 'pcm',
+        'seconds': seconds,
+        'wall_seconds': wall,
+        'cpu_seconds': cpu,
+        'cpu_per_stream': cpu / (guilds * seconds),
+        'threads_before': threads,
+        'threads_peak': peak_threads,
+        'lateness_ms': {
+            'p50': _percentile(lateness, 50) * 1000,
+            'p95': _percentile(lateness, 95) * 1000,
+            'p99': _percentile(lateness, 99) * 1000,
+            'max': lateness[-1] * 1000 if lateness else 0.0
+        },
+        'late_frames': sum(late > LATE_THRESHOLD for late in lateness)
+    }
+
+
+async def run(guild_counts: list[int], seconds: float, opus: bool) -> list[dict[str, Any]]:
+    results = []
+    for guilds in guild_counts:
+        result = await run_scenario(guilds, seconds, opus)
+        print(json.dumps(result), file=sys.stderr)
+        results.append(result)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='python bench/loadtest.py', description=__doc__)
+    parser.add_argument(
+        '--guilds',
+        type=int,
+        nargs='+',
+        default=[1, 10, 50, 100, 200],
+        help='The guild counts to run'
+    )
+    parser.add_argument('--seconds', type=float, default=10.0, help='Seconds of audio per guild')
+    parser.add_argument(
+        '--source',
+        choices=('pcm', 'opus'),
+        default='pcm',
+        help='Send PCM which gets encoded or pre-encoded opus packets'
+    )
+    parser.add_argument('--output', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.guilds, args.seconds, args.source == 'opus'))
+    print(json.dumps(results, indent=4))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+import asyncio
+from typing import Iterator
+from timing import Result, measure
+from utils import ListMenu
+
+
+__all__ = [
+    'run'
+]
+
+
+SIZES = (1_000, 100_000, 1_000_000)
+
+
+def _benchmarks(size: int) -> Iterator[Result]:
+    items = [f'**{index}. **[Song title {index}](https://youtu.be/{index})' for index in range(size)]
+    menu = ListMenu(items, None, title='Queue', description='Benchmark')
+    for label, page in (('first', 0), ('middle', menu.max_pages // 2), ('last', menu.max_pages - 1)):
+        yield Result(f'menu.update_page.{label}', size, measure(
+            lambda _: menu._update_page(page),
+            number=1000
+        ))
+    yield Result('menu.max_pages', size, measure(
+        lambda _: menu.max_pages,
+        number=1000
+    ))
+
+
+async def _run(sizes: tuple[int, ...]) -> list[Result]:
+    # views need a running event loop to be created
+    return [result for size in sizes for result in _benchmarks(size)]
+
+
+def run(sizes: tuple[int, ...] = SIZES) -> list[Result]:
+    """Run the ListMenu benchmarks for every size."""
+    return asyncio.run(_run(sizes))
@@ -0,0 +1,80 @@
+import random
+from itertools import islice
+from typing import Iterator
+from timing import Result, measure
+from utils import Queue, RepeatMode
+
+
+__all__ = [
+    'run'
+]
+
+
+SIZES = (10, 1_000, 100_000, 1_000_000)
+
+
+def _queue(size: int, repeat: RepeatMode = RepeatMode.All) -> Queue[int]:
+    return Queue(range(size), repeat=repeat, index=size // 2)
+
+
+def _iterate(queue: Queue[int]) -> None:
+    for _ in queue:
+        pass
+
+
+def _iterate_repeating(queue: Queue[int]) -> None:
+    for _ in islice(queue, 2 * len(queue)):
+        pass
+
+
+def _benchmarks(size: int) -> Iterator[Result]:
+    # operations which change the size of the queue run on a fresh queue
+    # every repetition, `number` is kept small enough not to skew the size
+    number = max(1, min(1000, size // 10))
+    middle = size // 2
+
+    seconds = measure(
+        _iterate,
+        lambda: _queue(size, RepeatMode.Off),
+        repeat=3
+    )
+    yield Result('queue.iter', size, seconds / (size - middle))
+
+    seconds = measure(_iterate_repeating, lambda: _queue(size), repeat=3)
+    yield Result('queue.iter_repeat_all', size, seconds / (2 * size))
+
+    yield Result('queue.insert', size, measure(
+        lambda queue: queue.insert(middle, -1),
+        lambda: _queue(size),
+        number=number
+    ))
+    yield Result('queue.pop', size, measure(
+        lambda queue: queue.pop(0),
+        lambda: _queue(size),
+        number=number
+    ))
+    yield Result('queue.remove', size, measure(
+        lambda queue: queue.remove(middle),
+        lambda: _queue(size),
+        repeat=3
+    ))
+    yield Result('queue.shuffle', size, measure(
+        lambda queue: queue.shuffle(),
+        lambda: (random.seed(0), _queue(size))[1],
+        repeat=3
+    ))
+    yield Result('queue.jump', size, measure(
+        lambda queue: queue.jump(middle),
+        lambda: _queue(size),
+        number=1000
+    ))
+    yield Result('queue.skip', size, measure(
+        lambda queue: queue.skip(1),
+        lambda: _queue(size),
+        number=1000
+    ))
+
+
+def run(sizes: tuple[int, ...] = SIZES) -> list[Result]:
+    """Run the Queue benchmarks for every size."""
+    return [result for size in sizes for result in _benchmarks(size)]
@@ -0,0 +1,56 @@
+import time
+from attrs import define
+from typing import Any, Callable, Optional
+
+
+__all__ = [
+    'Result',
+    'measure'
+]
+
+
+@define
+class Result:
+    """
+    The timing of a single benchmark.
+
+    Attributes
+    ----------
+    name: `str`
+        The name of the benchmark
+    size: `int`
+        The amount of items the benchmark was run with
+    seconds: `float`
+        The best time of a single operation in seconds
+    """
+
+    name: str
+    size: int
+    seconds: float
+
+    @property
+    def key(self) -> str:
+        return f'{self.name}[{self.size}]'
+
+
+def measure(
+    operation: Callable[[Any], Any],
+    setup: Optional[Callable[[], Any]] = None,
+    *,
+    number: int = 1,
+    repeat: int = 5
+) -> float:
+    """
+    Time `operation` and return the best time of a single call in seconds.
+
+    `operation` is called `number` times per repetition with the value
+    returned by `setup`, which is called once before every repetition.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        state = setup() if setup is not None else None
+        start = time.perf_counter()
+        for _ in range(number):
+            operation(state)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
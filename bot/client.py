@@ -0,0 +1,359 @@
+import asyncio
+import discord
+import hashlib
+import importlib
+import json
+import os
+import signal
+import time
+from discord.ext import commands
+from multiprocessing.connection import Client
+from types import ModuleType
+from typing import Any, Optional, Sequence
+from utils import REGISTRY, TRACER, IPCChannel
+
+from dotenv import load_dotenv
+load_dotenv()
+
+
+__all__ = [
+    'Bot',
+    'ShardedBot',
+    'create_client',
+    'run_worker'
+]
+
+
+with open('bot/bot_info.json', 'r') as bot_info_json:
+    guild_ids = json.load(bot_info_json)['guilds']
+    GUILD_IDS = list(map(discord.Object, guild_ids))
+
+TREE_HASHES_PATH = 'bot/tree_hashes.json'
+
+GATEWAY_EVENTS = REGISTRY.counter(
+    'bot_gateway_events_total',
+    'Events received from the gateway',
+    labels=('event',)
+)
+GATEWAY_LATENCY = REGISTRY.gauge('bot_gateway_latency_seconds', 'Gateway heartbeat latency')
+
+
+class Bot(commands.Bot):
+    """
+    Inherits from `commands.Bot`.
+
+    Parameters
+    ----------
+    plugin_dir: `str`
+        The directory inside `bot/` plugins are loaded from
+    tree_hashes_path: `str`
+        The file the hashes of the last synced command trees are stored in
+    max_concurrent_syncs: `int`
+        The maximum amount of guild command trees synced at the same time
+    sync_commands: `bool`
+        Whether to sync command trees when loading plugins
+    metrics_port: `Optional[int]`
+        The localhost port to serve metrics on, metrics aren't served if None
+    worker: `Optional[int]`
+        The number of the shard worker this bot runs in, None if it isn't one
+
+    Attributes
+    ----------
+    worker: `Optional[int]`
+        The number of the shard worker this bot runs in, None if it isn't one
+    plugin_state: `dict[str, Any]`
+        State handed over between a plugin's `teardown` and the `setup`
+        of its reloaded module, keyed by module name
+    ipc: `Optional[IPCChannel]`
+        The channel to the supervisor when running as a shard worker
+    draining: `bool`
+        Whether the bot is waiting for playback to finish before closing
+    closing: `bool`
+        Whether the bot is closing, cogs unloaded meanwhile aren't reloaded
+    """
+
+    def __init__(self,
+        *args,
+        plugin_dir: str,
+        tree_hashes_path: str = TREE_HASHES_PATH,
+        max_concurrent_syncs: int = 4,
+        sync_commands: bool = True,
+        metrics_port: Optional[int] = None,
+        worker: Optional[int] = None,
+        **kwargs
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self._plugins_dir = plugin_dir
+        self._tree_hashes_path = tree_hashes_path
+        self._max_concurrent_syncs = max_concurrent_syncs
+        self._sync_commands = sync_commands
+        self._metrics_port = metrics_port
+        self.worker = worker
+        self._plugins: dict[str, tuple[ModuleType, float]] = {}
+        self._guilds: Sequence[discord.Object] = ()
+        self.plugin_state: dict[str, Any] = {}
+        self.ipc: Optional[IPCChannel] = None
+        self.draining = False
+        self.closing = False
+
+    def _import_plugins(self) -> list[ModuleType]:
+        plugins = []
+        plugin_path = f'bot/{self._plugins_dir}'
+        for dirpath, _, filenames in os.walk(plugin_path):
+            if os.path.basename(dirpath) == '__pycache__':
+                continue
+            for file in filenames:
+                if file == '__init__.py' or not file.endswith('.py'):
+                    continue
+                plugin_path = f'{dirpath.replace("/", ".")}.{file}'
+                start = plugin_path.find(self._plugins_dir)
+                plugin_path = plugin_path[start: -3]
+                plugins.append(importlib.import_module(plugin_path))
+        return plugins
+
+    async def _setup_plugin(self, plugin: ModuleType) -> None:
+        if not hasattr(plugin, 'setup'):
+            print(
+                f'Plugin \'{plugin.__name__}\' does not have a setup function'
+            )
+            return
+        await plugin.setup(self, self._guilds)
+        self._plugins[plugin.__name__] = (plugin, os.path.getmtime(plugin.__file__))
+        print(f'loaded \'{plugin.__name__}\'')
+
+    def _tree_hash(self, guild: discord.Object) -> str:
+        payload = sorted(
+            (command.to_dict() for command in self.tree.get_commands(guild=guild)),
+            key=lambda command: (command['name'], command.get('type', 1))
+        )
+        return hashlib.sha256(
+            json.dumps(payload, sort_keys=True).encode()
+        ).hexdigest()
+
+    def _read_tree_hashes(self) -> dict[str, str]:
+        try:
+            with open(self._tree_hashes_path, 'r') as hashes_json:
+                return json.load(hashes_json)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    async def sync_tree(self, *, guilds: Sequence[discord.Object]) -> None:
+        """
+        Sync the command tree of every guild whose commands changed.
+
+        A hash of each guild's tree is stored after syncing, guilds whose
+        hash matches the stored one are skipped.
+        """
+        if not self._sync_commands:
+            return
+        hashes = self._read_tree_hashes()
+        semaphore = asyncio.Semaphore(self._max_concurrent_syncs)
+        synced = 0
+
+        async def sync(guild: discord.Object) -> None:
+            nonlocal synced
+            tree_hash = self._tree_hash(guild)
+            if hashes.get(str(guild.id)) == tree_hash:
+                return
+            async with semaphore:
+                await self.tree.sync(guild=guild)
+            hashes[str(guild.id)] = tree_hash
+            synced += 1
+
+        try:
+            await asyncio.gather(*map(sync, guilds))
+        finally:
+            with open(self._tree_hashes_path, 'w') as hashes_json:
+                json.dump(hashes, hashes_json, indent=4)
+        print(f'synced {synced}/{len(guilds)} guild command trees')
+
+    async def load_plugins(
+        self,
+        *,
+        guilds: Sequence[discord.Object]
+    ) -> None:
+        start = time.perf_counter()
+        plugins = self._import_plugins()
+        imported = time.perf_counter()
+        print(f'imported {len(plugins)} plugins in {imported - start:.3f}s')
+
+        self._guilds = guilds
+        for plugin in plugins:
+            await self._setup_plugin(plugin)
+        set_up = time.perf_counter()
+        print(f'set up plugins in {set_up - imported:.3f}s')
+
+        await self.sync_tree(guilds=guilds)
+        print(f'synced command trees in {time.perf_counter() - set_up:.3f}s')
+
+    async def reload_plugins(self) -> list[str]:
+        """
+        Reload every plugin whose file changed and load new plugins.
+
+        Plugins are torn down with their `teardown` function, re-imported and
+        set up again, state a plugin stores in `plugin_state` during teardown
+        is available to its new module's `setup`.
+
+        Returns the names of the reloaded and newly loaded plugins.
+        """
+        reloaded = []
+        for plugin in self._import_plugins():
+            name = plugin.__name__
+            if name not in self._plugins:
+                await self._setup_plugin(plugin)
+                reloaded.append(name)
+                continue
+            mtime = self._plugins[name][1]
+            if os.path.getmtime(plugin.__file__) == mtime:
+                continue
+            if hasattr(plugin, 'teardown'):
+                await plugin.teardown(self, self._guilds)
+            del self._plugins[name]
+            await self._setup_plugin(importlib.reload(plugin))
+            reloaded.append(name)
+        if reloaded:
+            await self.sync_tree(guilds=self._guilds)
+        return reloaded
+
+    def stats(self) -> dict[str, Any]:
+        """Get stats of this process, including those of cogs with a `stats` method."""
+        stats = {
+            'shards': list(getattr(self, 'shard_ids', None) or [self.shard_id or 0]),
+            'guilds': len(self.guilds),
+            'latency': self.latency
+        }
+        for cog in self.cogs.values():
+            if hasattr(cog, 'stats'):
+                stats.update(cog.stats())
+        return stats
+
+    async def global_stats(self) -> dict[str, Any]:
+        """Get the stats of every shard worker combined."""
+        if self.ipc is None:
+            return self.stats()
+        results = await asyncio.wrap_future(
+            self.ipc.request('broadcast', {'op': 'stats'})
+        )
+        combined: dict[str, Any] = {'workers': len(results)}
+        for stats in results:
+            for key, value in stats.items():
+                if key == 'latency':
+                    combined[key] = max(combined.get(key, 0), value)
+                elif isinstance(value, list):
+                    combined[key] = sorted(combined.get(key, []) + value)
+                else:
+                    combined[key] = combined.get(key, 0) + value
+        return combined
+
+    def is_busy(self) -> bool:
+        """Whether any cog with an `is_busy` method is busy."""
+        return any(cog.is_busy() for cog in self.cogs.values() if hasattr(cog, 'is_busy'))
+
+    async def drain(self, timeout: float = 600.0) -> None:
+        """Stop accepting new sessions, wait until no cog is busy and close."""
+        self.draining = True
+        deadline = time.monotonic() + timeout
+        while self.is_busy() and time.monotonic() < deadline:
+            await asyncio.sleep(1.0)
+        await self.close()
+
+    async def close(self) -> None:
+        self.closing = True
+        await super().close()
+        await TRACER.close()
+
+    def handle_ipc(self, op: str, data: Any) -> Any:
+        """Handle a request from the supervisor, called from the IPC thread."""
+        if op == 'stats':
+            coro = self._stats()
+        elif op == 'drain':
+            coro = self.drain()
+        else:
+            raise ValueError(f'Unknown operation {op}')
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def _stats(self) -> dict[str, Any]:
+        return self.stats()
+
+    async def _count_gateway_event(self, event: str) -> None:
+        GATEWAY_EVENTS.inc(event=event)
+
+    async def setup_hook(self) -> None:
+        trace_path = os.environ.get('TRACE_PATH')
+        if trace_path is not None:
+            TRACER.open(trace_path)
+        if self._metrics_port is not None:
+            GATEWAY_LATENCY.set_function(lambda: self.latency)
+            self.add_listener(self._count_gateway_event, 'on_socket_event_type')
+            REGISTRY.serve(self._metrics_port)
+            print(f'serving metrics on port {self._metrics_port}')
+        await self.load_plugins(guilds=GUILD_IDS)
+
+
+class ShardedBot(Bot, commands.AutoShardedBot):
+    """A `Bot` running a subset of shards, see `commands.AutoShardedBot`."""
+
+
+@commands.command(name='reload')
+@commands.is_owner()
+async def _reload(ctx: commands.Context):
+    start = time.perf_counter()
+    reloaded = await ctx.bot.reload_plugins()
+    if not reloaded:
+        await ctx.send('No plugins changed')
+        return
+    names = ', '.join(f'`{name}`' for name in reloaded)
+    await ctx.send(f'Reloaded {names} in {(time.perf_counter() - start) * 1000:.0f}ms')
+
+
+@commands.command(name='stats')
+@commands.is_owner()
+async def _stats(ctx: commands.Context):
+    stats = await ctx.bot.global_stats()
+    await ctx.send('\n'.join(f'{key}: {value}' for key, value in stats.items()))
+
+
+def create_client(cls: type[Bot] = Bot, **kwargs) -> Bot:
+    """Create the bot with its prefix commands."""
+    intents = discord.Intents.default()
+    intents.message_content = True
+    client = cls(
+        '+',
+        plugin_dir='plugins',
+        application_id=967433475521118268,
+        intents=intents,
+        **kwargs
+    )
+    client.add_command(_reload)
+    client.add_command(_stats)
+    return client
+
+
+def run_worker(
+    worker: int,
+    shard_ids: list[int],
+    shard_count: int,
+    address: Any,
+    authkey: bytes
+) -> None:
+    """Run a shard worker process, see `sharding.Supervisor`."""
+    if TOKEN is None:
+        raise ValueError("TOKEN NOT FOUND!")
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    connection = Client(address, authkey=authkey)
+    connection.send({'worker': worker})
+    metrics_port = os.environ.get('METRICS_PORT')
+    client = create_client(
+        ShardedBot,
+        shard_ids=shard_ids,
+        shard_count=shard_count,
+        sync_commands=worker == 0,
+        metrics_port=None if metrics_port is None else int(metrics_port) + worker,
+        worker=worker
+    )
+    client.ipc = IPCChannel(connection, client.handle_ipc)
+    client.ipc.start()
+    client.run(TOKEN)
+
+
+TOKEN = os.environ.get('DISCORD_TOKEN')
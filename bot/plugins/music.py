@@ -1,8 +1,12 @@
 import asyncio
 import enum
+import math
 from multiprocessing.sharedctypes import Value
 import discord
+import os
 import pytube
+import re
+import subprocess
 import threading
 import time
 from attrs import define
@@ -11,11 +15,29 @@ from discord.enums import SpeakingState
 from discord.ext import commands
 from discord.opus import Encoder as OpusEncoder
 from collections import deque
+from functools import partial
+from types import SimpleNamespace
 from typing import Any, Callable, Deque, Optional
+from urllib.error import HTTPError, URLError
 from utils import (
+    REGISTRY,
+    TRACER,
+    EditScheduler,
+    EncoderSettings,
+    FrameBuffer,
+    HistoryEvent,
     ListMenu,
+    OverloadController,
+    OverloadLevel,
+    PlayHistory,
+    SamplingProfiler,
+    PipeStream,
     Queue,
+    RateLimiter,
     RepeatMode,
+    SearchIndex,
+    SingleFlight,
+    StreamFetcher,
     bot_connected,
     to_ordinal,
     to_readable_time,
@@ -31,9 +53,85 @@ FFMPEG_SOURCE_OPTIONS = {
     'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
     'options': '-vn'
 }
+FFMPEG_PIPE_OPTIONS = {
+    'options': '-vn'
+}
+HISTORY_PATH = os.environ.get('HISTORY_PATH', 'bot/history.jsonl')
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'bot/profiles')
+
+
+COMMANDS = REGISTRY.counter(
+    'bot_app_commands_total',
+    'App commands run, by command and outcome',
+    labels=('command', 'status')
+)
+COMMAND_SECONDS = REGISTRY.histogram(
+    'bot_app_command_seconds',
+    'Seconds from an interaction being created to its command completing',
+    labels=('command',)
+)
+RESOLVE_SECONDS = REGISTRY.histogram(
+    'bot_resolve_seconds',
+    'Seconds taken to find a video and its stream'
+)
+RESOLVE_FAILURES = REGISTRY.counter(
+    'bot_resolve_failures_total',
+    'Queries which no video was found for'
+)
+PLAYERS_STARTED = REGISTRY.counter('bot_players_started_total', 'Player threads started')
+PLAYERS_STOPPED = REGISTRY.counter('bot_players_stopped_total', 'Player threads stopped')
+SONGS_STARTED = REGISTRY.counter('bot_songs_started_total', 'Songs started by players')
+PLAYERS = REGISTRY.gauge('bot_players', 'Guilds with a player')
+PLAYER_THREADS = REGISTRY.gauge('bot_player_threads', 'Alive player threads')
+FFMPEG_PROCESSES = REGISTRY.gauge('bot_ffmpeg_processes', 'Running ffmpeg processes')
+RESOLVE_CALLS = REGISTRY.counter('bot_resolve_calls_total', 'Resolves which looked up a video')
+RESOLVE_COALESCED = REGISTRY.counter(
+    'bot_resolve_coalesced_total',
+    'Resolves which waited for an identical running lookup'
+)
+STREAM_BYTES = REGISTRY.counter('bot_stream_bytes_total', 'Bytes downloaded for piped streams')
+STREAM_REQUESTS = REGISTRY.counter(
+    'bot_stream_requests_total',
+    'HTTP requests made for piped streams'
+)
+STREAM_RETRIES = REGISTRY.counter(
+    'bot_stream_retries_total',
+    'HTTP requests of piped streams retried'
+)
+RESOLVE_BACKOFFS = REGISTRY.counter('bot_resolve_backoffs_total', 'Upstream throttling backoffs')
+RADIO_STATIONS = REGISTRY.gauge('bot_radio_stations', 'Radio stations')
+RADIO_LISTENERS = REGISTRY.gauge('bot_radio_listeners', 'Guilds tuned in to a radio station')
+OVERLOAD_LEVEL = REGISTRY.gauge('bot_overload_level', 'The current overload level from 0 to 4')
+PLAYERS_SHED = REGISTRY.gauge('bot_players_shed', 'Players paused to shed load')
+AUTOPLAY_SONGS = REGISTRY.counter('bot_autoplay_songs_total', 'Songs added by autoplay')
+AUTOPLAY_PRELOADS = REGISTRY.counter(
+    'bot_autoplay_preloads_total',
+    'Autoplay songs whose source was created ahead of time'
+)
+HISTORY_EVENTS = REGISTRY.counter(
+    'bot_history_events_total',
+    'Play history events written to the log'
+)
+PLAYER_UNDERRUNS = REGISTRY.counter(
+    'bot_player_underruns_total',
+    'Frames players had to wait for the reader thread for'
+)
+
+RESOLVE_ATTEMPTS = 3
+VIDEO_ID_PATTERN = re.compile(
+    r'(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/)|youtu\.be/)([\w-]{11})'
+)
 
 
-class VideoNotFoundError(Exception):
+class ResolveError(Exception):
+    pass
+
+
+class VideoNotFoundError(ResolveError):
+    pass
+
+
+class ResolveThrottledError(ResolveError):
     pass
 
 
@@ -62,6 +160,8 @@ class Song:
         URL to the audio stream of the song
     duration: `int`
         Duration of the song in seconds
+    video_id: `str`
+        The id of the video
     """
 
     title: str
@@ -70,6 +170,7 @@ class Song:
     page_url: str
     url: str
     duration: int
+    video_id: str
 
     def __str__(self) -> str:
         return f'[{self.title}]({self.page_url})'
@@ -78,29 +179,165 @@ class Song:
         return f'Song([{self.title}]({self.page_url}))'
 
 
-def find_video(arg: str) -> Song:
-    """Return Song object with info extracted from first video found."""
-    results = pytube.Search(arg).results
-    if not results:
-        raise VideoNotFoundError(f'Couldn\'t find video from query {arg}')
-    video = results[0]
-    url = video.streams.get_audio_only().url
-
+def _song(video: pytube.YouTube) -> Song:
+    stream = video.streams.get_audio_only()
+    if stream is None:
+        raise VideoNotFoundError(f'Video {video.video_id} has no audio stream')
     return Song(
         title=video.title,
         channel_name=video.author,
         thumbnail=video.thumbnail_url,
         page_url=video.watch_url,
-        url=url,
-        duration=video.length
+        url=stream.url,
+        duration=video.length,
+        video_id=video.video_id
     )
 
 
+def find_video(arg: str) -> Song:
+    """Return Song object with info extracted from first video found."""
+    with RESOLVE_SECONDS.time():
+        try:
+            results = pytube.Search(arg).results
+            if not results:
+                raise VideoNotFoundError(f'Couldn\'t find video from query {arg}')
+            return _song(results[0])
+        except pytube.exceptions.PytubeError as err:
+            raise VideoNotFoundError(f'Couldn\'t load video from query {arg}: {err}') from err
+
+
+def find_video_by_id(video_id: str) -> Song:
+    """Return Song object with info extracted from the video with the given id."""
+    with RESOLVE_SECONDS.time():
+        try:
+            return _song(pytube.YouTube.from_id(video_id))
+        except pytube.exceptions.PytubeError as err:
+            raise VideoNotFoundError(f'Couldn\'t load video {video_id}: {err}') from err
+
+
+def video_id_from_query(query: str) -> Optional[str]:
+    """Get the video id from a youtube url, None if the query isn't one."""
+    match = VIDEO_ID_PATTERN.search(query)
+    return None if match is None else match.group(1)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize case and whitespace of a search query."""
+    return ' '.join(query.casefold().split())
+
+
+_RESOLVES = SingleFlight()
+UPSTREAM_LIMITER = RateLimiter(5.0, burst=10)
+
+
+async def _lookup(query: str, video_id: Optional[str]) -> Song:
+    loop = asyncio.get_running_loop()
+    for attempt in range(1, RESOLVE_ATTEMPTS + 1):
+        await UPSTREAM_LIMITER.acquire()
+        try:
+            if video_id is None:
+                song = await loop.run_in_executor(None, find_video, query)
+            else:
+                song = await loop.run_in_executor(None, find_video_by_id, video_id)
+        except VideoNotFoundError:
+            RESOLVE_FAILURES.inc()
+            raise
+        except HTTPError as err:
+            if err.code == 429 and attempt < RESOLVE_ATTEMPTS:
+                RESOLVE_BACKOFFS.inc()
+                UPSTREAM_LIMITER.backoff()
+                continue
+            RESOLVE_FAILURES.inc()
+            if err.code == 429:
+                raise ResolveThrottledError('YouTube is throttling lookups') from err
+            raise ResolveError(f'Lookup failed with HTTP {err.code}') from err
+        except URLError as err:
+            RESOLVE_FAILURES.inc()
+            raise ResolveError(f'Couldn\'t reach YouTube: {err.reason}') from err
+        UPSTREAM_LIMITER.reset_backoff()
+        return song
+
+
+async def resolve(query: str) -> Song:
+    """
+    Find a song without blocking the event loop.
+
+    Queries which are youtube urls are looked up by video id. Concurrent
+    resolves of the same normalized query or video id share one lookup, and
+    lookups are rate limited with a backoff when youtube throttles requests.
+    Raises a `ResolveError` if the song can't be found or looked up.
+    """
+    video_id = video_id_from_query(query)
+    key = f'id:{video_id}' if video_id is not None else f'query:{normalize_query(query)}'
+    return await _RESOLVES.run(key, lambda: _lookup(query, video_id))
+
+
+def history_path(worker: Optional[int]) -> str:
+    """
+    The play history file of a process.
+
+    Shard workers each log the events of their own guilds, to `HISTORY_PATH`
+    with the worker number added before the extension.
+    """
+    if worker is None:
+        return HISTORY_PATH
+    root, extension = os.path.splitext(HISTORY_PATH)
+    return f'{root}-{worker}{extension}'
+
+
+def resolve_failure_message(query: str, err: ResolveError) -> str:
+    """Explain to the user why `resolve` failed."""
+    if isinstance(err, VideoNotFoundError):
+        return f'Couldn\'t find any videos from query `{query}`'
+    if isinstance(err, ResolveThrottledError):
+        return 'YouTube is limiting how many songs I can look up, try again later'
+    return 'Couldn\'t reach YouTube, try again later'
+
+
+def ffmpeg_source(song: Song) -> discord.AudioSource:
+    """Create an ffmpeg source streaming the song's audio url."""
+    return FFmpegPCMAudio(song.url, **FFMPEG_SOURCE_OPTIONS)
+
+
+class PipedFFmpegPCMAudio(FFmpegPCMAudio):
+    """An ffmpeg source reading a `PipeStream`, the download is stopped on cleanup."""
+
+    def __init__(self, stream: PipeStream, **kwargs) -> None:
+        super().__init__(stream, pipe=True, **kwargs)
+        self._stream = stream
+
+    def _pipe_writer(self, source: PipeStream) -> None:
+        # the library terminates ffmpeg at the end of the input, which cuts off
+        # the audio still in the pipe and ffmpeg's buffers, closing stdin lets it drain
+        while self._process:
+            data = source.read(8192)
+            try:
+                if not data:
+                    self._stdin.close()
+                    return
+                self._stdin.write(data)
+            except Exception:
+                # ffmpeg exited, there is nothing left to drain
+                if self._process:
+                    self._process.terminate()
+                return
+
+    def cleanup(self) -> None:
+        self._stream.close()
+        super().cleanup()
+
+
 class DisconnectReason(enum.Enum):
     NOT_PLAYING = 0
     ALONE_IN_CHANNEL = 1
 
 
+class SongEnd(enum.Enum):
+    FINISHED = 0
+    SKIPPED = 1
+    STOPPED = 2
+
+
 # Yes this is mostly stolen from the library itself
 # I just wanted to make a version which can work with a loop
 # and is a single thread instead of creating a thread per source
@@ -116,30 +353,86 @@ class Player(threading.Thread):
         An optional starting queue
     on_error: `Optional[Callable[[Optional[Exception]], Any]]`
         A function run when the player errors
+    on_song_start: `Optional[Callable[[Song], Any]]`
+        A function run from the player thread when a song starts playing
+    on_song_end: `Optional[Callable[[Song, float, SongEnd], Any]]`
+        A function run from the player thread when a song stops playing, with
+        the seconds played and whether it finished, was skipped or the player
+        was shut down
+    source_factory: `Callable[[Song], discord.AudioSource]`
+        A function creating the audio source of a song, `ffmpeg_source` by default
+    read_ahead: `int`
+        The amount of frames read ahead of playback
+    encoder_settings: `Optional[EncoderSettings]`
+        The encoder settings, picked for the bitrate of the voice channel if not given
 
     Attributes
     ----------
     source: `Optional[discord.AudioSource]`
         The currently playing source, None if the player hasn't been started
+    song: `Optional[Song]`
+        The currently playing song, None if the player hasn't been started
+    frames: `int`
+        The amount of frames of the current song sent so far
+    buffer: `FrameBuffer`
+        The buffer frames of the current source are read ahead into
+    encoder_settings: `EncoderSettings`
+        The settings the encoder was last configured with
+    complexity_limit: `Optional[int]`
+        The highest encoder complexity allowed, overrides the configured settings
+    frames_sent: `int`
+        The amount of frames sent since the player started
+    late_frames: `int`
+        The amount of frames sent more than `LATE_THRESHOLD` seconds late
     """
 
     DELAY = OpusEncoder.FRAME_LENGTH / 1000.0
+    LATE_THRESHOLD = DELAY / 2
+    # how often waits on the voice client's connection check for a shutdown
+    SHUTDOWN_POLL = 0.5
 
     def __init__(
         self,
         voice_client: discord.VoiceClient,
         *,
-        queue: Queue[Song] = Queue(),
+        queue: Optional[Queue[Song]] = None,
         timeout: float = 15.0,
-        on_error: Optional[Callable[[Optional[Exception]], Any]] = None
+        on_error: Optional[Callable[[Optional[Exception]], Any]] = None,
+        on_song_start: Optional[Callable[[Song], Any]] = None,
+        on_song_end: Optional[Callable[[Song, float, SongEnd], Any]] = None,
+        source_factory: Callable[[Song], discord.AudioSource] = ffmpeg_source,
+        read_ahead: int = 50,
+        encoder_settings: Optional[EncoderSettings] = None
     ) -> None:
-        threading.Thread.__init__(self)
+        threading.Thread.__init__(self, name=f'player-{voice_client.guild.id}')
         self.daemon = True
         self.voice_client = voice_client
         self.voice_client.encoder = OpusEncoder()
+        if encoder_settings is None:
+            channel = getattr(voice_client, 'channel', None)
+            encoder_settings = (
+                EncoderSettings() if channel is None
+                else EncoderSettings.for_bitrate(channel.bitrate)
+            )
+        self.encoder_settings = encoder_settings
+        self.encoder_settings.apply(self.voice_client.encoder)
+        self._configured_settings = encoder_settings
+        self._pending_settings: Optional[EncoderSettings] = None
+        self.complexity_limit: Optional[int] = None
+        self.frames_sent = 0
+        self.late_frames = 0
+        self._preloaded: Optional[tuple[Song, discord.AudioSource]] = None
+        self._preload_lock = threading.Lock()
         self.queue = Queue() if queue is None else queue
 
         self.source = None
+        self.song: Optional[Song] = None
+        self.frames = 0
+        self.buffer = FrameBuffer(
+            depth=read_ahead,
+            name=f'reader-{voice_client.guild.id}',
+            on_underrun=PLAYER_UNDERRUNS.inc
+        )
 
         self._active = threading.Event()
         self._active.set()
@@ -152,8 +445,13 @@ class Player(threading.Thread):
         self._resumed = threading.Event()
         self._resumed.set()
         self._connected = voice_client._connected
+        self._closed = threading.Event()
 
         self.on_error = on_error
+        self.on_song_start = on_song_start
+        self.on_song_end = on_song_end
+        self.source_factory = source_factory
+        self._err: Optional[Exception] = None
 
     def _do_run(self):
         self.loops = 0
@@ -163,34 +461,128 @@ class Player(threading.Thread):
         play = self.voice_client.send_audio_packet
 
         while self._connected.is_set():
-            self._active.wait()
+            if not self._wait(self._active):
+                return
             for song in self.queue:
                 self._source_set.set()
-                self.source = FFmpegPCMAudio(song.url, **FFMPEG_SOURCE_OPTIONS)
+                self.source = self._take_preloaded(song) or self.source_factory(song)
+                self.buffer.attach(self.source)
+                self.song = song
+                self.frames = 0
+                SONGS_STARTED.inc()
                 self._end.clear()
+                if self.on_song_start is not None:
+                    self.on_song_start(song)
+                finished = False
                 while not self._end.is_set():
                     if not self._resumed.is_set():
-                        self._resumed.wait()
+                        if not self._wait(self._resumed):
+                            break
                         continue
 
                     if not self._connected.is_set():
-                        self._connected.wait()
+                        if not self._wait(self._connected):
+                            break
                         self.loops = 0
                         self._start = time.perf_counter()
 
                     self.loops += 1
 
-                    data = self.source.read()
-                    if not data:
+                    if self._pending_settings is not None:
+                        self._apply_settings()
+
+                    data = self.buffer.get()
+                    if data is None:
+                        finished = True
                         self._end.set()
                         break
 
-                    play(data, encode=not self.source.is_opus())
                     next_time = self._start + self.DELAY * self.loops
+                    if time.perf_counter() - next_time > self.LATE_THRESHOLD:
+                        self.late_frames += 1
+                    play(data, encode=not self.source.is_opus())
+                    self.frames += 1
+                    self.frames_sent += 1
                     delay = max(0, self.DELAY + (next_time - time.perf_counter()))
                     time.sleep(delay)
+                self.buffer.detach()
+                self.source.cleanup()
+                if self.on_song_end is not None:
+                    if self._closed.is_set():
+                        end = SongEnd.STOPPED
+                    else:
+                        end = SongEnd.FINISHED if finished else SongEnd.SKIPPED
+                    self.on_song_end(song, self.elapsed, end)
+                if self._closed.is_set():
+                    return
+            self._active.clear()
             self.add_timeout(DisconnectReason.NOT_PLAYING)
 
+    def _wait(self, event: threading.Event) -> bool:
+        '''Wait for `event`, False if the player was shut down instead.'''
+        while not event.wait(self.SHUTDOWN_POLL):
+            if self._closed.is_set():
+                return False
+        return not self._closed.is_set()
+
+    def configure_encoder(self, settings: EncoderSettings) -> None:
+        '''
+        Change the encoder settings.
+
+        The settings are applied by the player thread before the next frame,
+        or right away if the player isn't running.
+        '''
+        self._configured_settings = settings
+        self._queue_settings()
+
+    def limit_complexity(self, limit: Optional[int]) -> None:
+        '''Limit the encoder complexity, None removes the limit.'''
+        self.complexity_limit = limit
+        self._queue_settings()
+
+    def _queue_settings(self) -> None:
+        settings, limit = self._configured_settings, self.complexity_limit
+        if limit is not None and settings.complexity > limit:
+            settings = settings.with_complexity(limit)
+        self._pending_settings = settings
+        if not self.is_alive():
+            self._apply_settings()
+
+    def _apply_settings(self) -> None:
+        settings, self._pending_settings = self._pending_settings, None
+        if settings is not None and settings != self.encoder_settings:
+            settings.apply(self.voice_client.encoder)
+            self.encoder_settings = settings
+
+    def preload(self, song: Song) -> None:
+        '''
+        Create the source of `song` ahead of time so it starts without a gap.
+
+        The source is used if `song` is the next song played, otherwise it's
+        cleaned up. Can be called from any thread.
+        '''
+        source = self.source_factory(song)
+        with self._preload_lock:
+            previous, self._preloaded = self._preloaded, (song, source)
+        if previous is not None:
+            previous[1].cleanup()
+
+    @property
+    def preloaded_source(self) -> Optional[discord.AudioSource]:
+        '''The source created by `preload`, None if there is none.'''
+        preloaded = self._preloaded
+        return None if preloaded is None else preloaded[1]
+
+    def _take_preloaded(self, song: Optional[Song]) -> Optional[discord.AudioSource]:
+        with self._preload_lock:
+            preloaded, self._preloaded = self._preloaded, None
+        if preloaded is None:
+            return None
+        if preloaded[0] is song:
+            return preloaded[1]
+        preloaded[1].cleanup()
+        return None
+
     def _timeout(self):
         asyncio.run_coroutine_threadsafe(
             self.leave(),
@@ -198,6 +590,8 @@ class Player(threading.Thread):
         )
 
     def add_timeout(self, reason: DisconnectReason):
+        if self._closed.is_set():
+            return
         if reason in self._timeouts:
             raise ValueError(f'Timer of type {reason} was already added')
         timer = threading.Timer(
@@ -214,13 +608,18 @@ class Player(threading.Thread):
             timer.cancel()
 
     def run(self):
+        PLAYERS_STARTED.inc()
         try:
             self._do_run()
         except Exception as e:
             self._err = e
         finally:
+            PLAYERS_STOPPED.inc()
+            self.buffer.close()
+            self._take_preloaded(None)
+            if self.source is not None:
+                self.source.cleanup()
             self._call_error()
-            self.source.cleanup()
 
     def play(self):
         self.cancel_timeout(DisconnectReason.NOT_PLAYING)
@@ -230,6 +629,8 @@ class Player(threading.Thread):
             self.start()
 
     def _call_error(self):
+        if self._err is None:
+            return
         if self.on_error is None:
             raise self._err
         try:
@@ -251,8 +652,27 @@ class Player(threading.Thread):
         self._source_set.wait()
 
     async def leave(self) -> None:
+        self.shutdown()
         await self.voice_client.disconnect()
 
+    def shutdown(self) -> None:
+        '''
+        Stop the player for good, releasing its thread, reader thread and source.
+
+        Safe to call more than once and on a player which never started.
+        '''
+        self._closed.set()
+        for reason in list(self._timeouts):
+            self.cancel_timeout(reason)
+        self._end.set()
+        self._active.set()
+        self._resumed.set()
+        self._source_set.set()
+        self.buffer.close()
+        self._take_preloaded(None)
+        if self.source is not None:
+            self.source.cleanup()
+
     def pause(self, *, update_speaking: bool = True) -> None:
         self._resumed.clear()
         if update_speaking:
@@ -268,6 +688,11 @@ class Player(threading.Thread):
     def is_playing(self) -> bool:
         return self.source is not None and self._resumed.is_set() and not self._end.is_set()
 
+    @property
+    def elapsed(self) -> float:
+        """Seconds of the current song played so far."""
+        return self.frames * self.DELAY
+
     def is_paused(self) -> bool:
         return not self._end.is_set() and not self._resumed.is_set()
 
@@ -276,25 +701,587 @@ class Player(threading.Thread):
             self.voice_client.ws.speak(speaking), self.voice_client.loop)
 
 
+
+class BroadcastClient:
+    """
+    Stands in for the voice client of a `Player`, sending its audio to many voice clients.
+
+    Audio is encoded once and the opus packets are sent to every subscribed
+    voice client, subscribing or unsubscribing doesn't interrupt playback.
+
+    Parameters
+    ----------
+    name: `str`
+        The name of the broadcast, used for the player's thread names
+    loop: `asyncio.AbstractEventLoop`
+        The loop the subscribed voice clients run on
+
+    Attributes
+    ----------
+    subscribers: `dict[int, discord.VoiceClient]`
+        The subscribed voice clients by guild id
+    """
+
+    def __init__(self, name: str, loop: asyncio.AbstractEventLoop) -> None:
+        self.name = name
+        self.guild = SimpleNamespace(id=f'radio-{name}')
+        self.loop = loop
+        self.ws = self
+        self.encoder: Optional[OpusEncoder] = None
+        self.subscribers: dict[int, discord.VoiceClient] = {}
+        self._speaking = SpeakingState.none
+        self._connected = threading.Event()
+        self._connected.set()
+
+    def subscribe(self, voice_client: discord.VoiceClient) -> None:
+        """Start sending the broadcast to `voice_client`."""
+        self.subscribers[voice_client.guild.id] = voice_client
+        if self._speaking != SpeakingState.none:
+            asyncio.ensure_future(voice_client.ws.speak(self._speaking))
+
+    def unsubscribe(self, guild_id: int) -> Optional[discord.VoiceClient]:
+        """Stop sending the broadcast to the voice client of a guild and return it."""
+        return self.subscribers.pop(guild_id, None)
+
+    def send_audio_packet(self, data: bytes, *, encode: bool = True) -> None:
+        if encode:
+            data = self.encoder.encode(data, OpusEncoder.SAMPLES_PER_FRAME)
+        for voice_client in tuple(self.subscribers.values()):
+            try:
+                voice_client.send_audio_packet(data, encode=False)
+            except Exception:
+                # a subscriber which is reconnecting or closed skips the packet
+                pass
+
+    async def speak(self, speaking: SpeakingState) -> None:
+        self._speaking = speaking
+        await asyncio.gather(
+            *(voice_client.ws.speak(speaking) for voice_client in self.subscribers.values()),
+            return_exceptions=True
+        )
+
+    async def disconnect(self, *, force: bool = False) -> None:
+        """End the broadcast and disconnect every subscriber."""
+        self._connected.clear()
+        subscribers = list(self.subscribers.values())
+        self.subscribers.clear()
+        await asyncio.gather(
+            *(voice_client.disconnect(force=force) for voice_client in subscribers),
+            return_exceptions=True
+        )
+
+
 class Music(commands.Cog):
-    def __init__(self, client: commands.Bot):
+    """
+    Music commands.
+
+    Parameters
+    ----------
+    client: `commands.Bot`
+        The bot the cog is added to
+    players: `Optional[dict[int, Player]]`
+        Players carried over from a previous instance of the cog
+    now_playing: `Optional[EditScheduler]`
+        Scheduler carried over from a previous instance of the cog
+    song_index: `Optional[SearchIndex[Song]]`
+        Index of played songs carried over from a previous instance of the cog
+    fetcher: `Optional[StreamFetcher]`
+        Fetcher carried over from a previous instance of the cog, one is
+        created if the `STREAM_INPUT` environment variable is `pipe`
+    stations: `Optional[dict[str, Player]]`
+        Radio stations carried over from a previous instance of the cog
+    autoplay: `Optional[set[int]]`
+        Ids of guilds with autoplay enabled carried over from a previous instance of the cog
+    history: `Optional[PlayHistory]`
+        Play history carried over from a previous instance of the cog, one
+        logging to `history_path` is created and loaded if not given
+    """
+
+    NOW_PLAYING_REFRESH = 15.0
+    REDUCED_COMPLEXITY = 3
+    SHED_FRACTION = 0.25
+    PRELOAD_LEAD = 20.0
+
+    radio = app_commands.Group(
+        name='radio',
+        description='Stations playing the same audio in many servers',
+        guild_only=True
+    )
+
+    def __init__(
+        self,
+        client: commands.Bot,
+        *,
+        players: Optional[dict[int, Player]] = None,
+        now_playing: Optional[EditScheduler] = None,
+        song_index: Optional[SearchIndex[Song]] = None,
+        fetcher: Optional[StreamFetcher] = None,
+        stations: Optional[dict[str, Player]] = None,
+        autoplay: Optional[set[int]] = None,
+        history: Optional[PlayHistory] = None
+    ):
         self.client = client
-        self.players: dict[int, Player] = {}
+        self.players: dict[int, Player] = {} if players is None else players
+        self.now_playing = EditScheduler() if now_playing is None else now_playing
+        self.song_index: SearchIndex[Song] = SearchIndex() if song_index is None else song_index
+        self.fetcher = fetcher
+        if self.fetcher is None and os.environ.get('STREAM_INPUT') == 'pipe':
+            self.fetcher = StreamFetcher(client.loop)
+        self.stations: dict[str, Player] = {} if stations is None else stations
+        self.autoplay: set[int] = set() if autoplay is None else autoplay
+        self._load_history = history is None
+        if history is None:
+            history = PlayHistory(history_path(getattr(client, 'worker', None)))
+        self.history = history
+        self.overload = OverloadController(self._frame_totals, on_change=self._on_overload)
+        self._shed: set[Player] = set()
+        self.profiler = SamplingProfiler()
+        for guild_id, player in self.players.items():
+            player.on_song_start = partial(self._on_song_start, guild_id)
+            player.on_song_end = partial(self._on_song_end, guild_id)
+            player.source_factory = self.source_factory
+        for station in self.stations.values():
+            station.source_factory = self.source_factory
+
+    def export_state(self) -> dict[str, Any]:
+        """Get the state needed to continue playback in a new instance of the cog."""
+        return {
+            'players': self.players,
+            'now_playing': self.now_playing,
+            'song_index': self.song_index,
+            'fetcher': self.fetcher,
+            'stations': self.stations,
+            'autoplay': self.autoplay,
+            'history': self.history
+        }
+
+    def stats(self) -> dict[str, int]:
+        """Playback stats, see `Bot.stats`."""
+        return {
+            'players': len(self.players),
+            'playing': sum(player.is_playing() for player in self.players.values()),
+            'radio_listeners': self._radio_listeners(),
+            'overload_level': int(self.overload.level)
+        }
+
+    def is_busy(self) -> bool:
+        """Whether any player or station is playing, see `Bot.drain`."""
+        return any(player.is_playing() for player in self._all_players())
+
+    def session_refusal(self) -> Optional[str]:
+        """The reason new playback sessions are refused, None if they are accepted."""
+        if getattr(self.client, 'draining', False):
+            return 'I\'m restarting, try again in a few minutes'
+        if self.overload.level >= OverloadLevel.REFUSE_SESSIONS:
+            return 'I\'m overloaded right now, try again in a few minutes'
+        return None
+
+    def _all_players(self) -> list[Player]:
+        return [*self.players.values(), *self.stations.values()]
+
+    def _frame_totals(self) -> tuple[int, int]:
+        players = self._all_players()
+        return (
+            sum(player.frames_sent for player in players),
+            sum(player.late_frames for player in players)
+        )
+
+    def _complexity_limit(self) -> Optional[int]:
+        if self.overload.level >= OverloadLevel.REDUCE_QUALITY:
+            return self.REDUCED_COMPLEXITY
+        return None
+
+    @staticmethod
+    def _channels(player: Player) -> list[discord.abc.GuildChannel]:
+        # not isinstance, BroadcastClient is a new class after a reload
+        subscribers = getattr(player.voice_client, 'subscribers', None)
+        if subscribers is not None:
+            return [voice_client.channel for voice_client in subscribers.values()]
+        return [player.voice_client.channel]
+
+    def _listeners(self, player: Player) -> int:
+        return sum(
+            not member.bot for channel in self._channels(player) for member in channel.members
+        )
+
+    async def _announce(self, players: list[Player], message: str) -> None:
+        """Send a message to the text chat of the voice channels `players` play in."""
+        channels = [
+            channel for player in players for channel in self._channels(player)
+            if isinstance(channel, discord.abc.Messageable)
+        ]
+        await asyncio.gather(
+            *(channel.send(message) for channel in channels),
+            return_exceptions=True
+        )
+
+    def _on_overload(self, previous: OverloadLevel, level: OverloadLevel) -> None:
+        if previous != level:
+            print(f'Overload level changed from {previous.name} to {level.name}')
+        if (previous >= OverloadLevel.REDUCE_QUALITY) != (level >= OverloadLevel.REDUCE_QUALITY):
+            for player in self._all_players():
+                player.limit_complexity(self._complexity_limit())
+        if level >= OverloadLevel.PAUSE_BACKGROUND:
+            self.now_playing.stop()
+        else:
+            self.now_playing.start()
+        if level >= OverloadLevel.SHED_LOAD:
+            self._shed_load()
+        elif self._shed:
+            # resuming every player at once would bring back the overload
+            self._restore_shed(math.ceil(len(self._shed) * self.SHED_FRACTION))
+
+    def _shed_load(self) -> None:
+        """Pause a fraction of the players with the least listeners."""
+        candidates = sorted(
+            (
+                player for player in self._all_players()
+                if player.is_playing() and player not in self._shed
+            ),
+            key=self._listeners
+        )
+        # the player with the most listeners is never shed
+        candidates = candidates[:-1]
+        amount = math.ceil(len(candidates) * self.SHED_FRACTION)
+        for player in candidates[:amount]:
+            player.pause()
+            self._shed.add(player)
+        if amount:
+            print(f'Paused {amount} players to shed load, {len(self._shed)} paused in total')
+            asyncio.ensure_future(self._announce(
+                candidates[:amount],
+                'Playback is paused because I\'m overloaded, it will resume automatically'
+            ))
+
+    def _restore_shed(self, amount: Optional[int] = None) -> None:
+        """Resume `amount` shed players with the most listeners, every shed player if None."""
+        shed = sorted(self._shed, key=self._listeners, reverse=True)
+        restored = shed if amount is None else shed[:amount]
+        for player in restored:
+            self._shed.discard(player)
+            if player.is_alive() and player.is_paused():
+                player.resume()
+        if restored:
+            print(f'Resumed {len(restored)} shed players, {len(self._shed)} still paused')
+            asyncio.ensure_future(self._announce(restored, 'Playback resumed'))
+
+    def _remove_player(self, guild_id: int) -> Optional[Player]:
+        """Forget the player of a guild and the state kept for it, None if it has none."""
+        self.now_playing.unregister(guild_id)
+        self.autoplay.discard(guild_id)
+        player = self.players.pop(guild_id, None)
+        if player is not None:
+            self._shed.discard(player)
+        return player
+
+    def _ffmpeg_processes(self) -> int:
+        sources = [
+            source
+            for player in self._all_players()
+            for source in (player.source, player.preloaded_source)
+        ]
+        return sum(
+            # the library sets _process to MISSING on cleanup
+            isinstance(process := getattr(source, '_process', None), subprocess.Popen)
+            and process.poll() is None
+            for source in sources
+        )
+
+    def _radio_listeners(self) -> int:
+        return sum(len(station.voice_client.subscribers) for station in self.stations.values())
+
+    def station_of(self, guild_id: int) -> Optional[Player]:
+        """Get the station a guild is tuned in to, None if it isn't tuned in to one."""
+        for station in self.stations.values():
+            if guild_id in station.voice_client.subscribers:
+                return station
+        return None
+
+    async def cog_load(self) -> None:
+        self.now_playing.start()
+        self.overload.start()
+        if self._load_history:
+            self._load_history = False
+            asyncio.ensure_future(self._seed_song_index())
+        else:
+            self.history.start()
+        PLAYERS.set_function(lambda: len(self.players))
+        RADIO_STATIONS.set_function(lambda: len(self.stations))
+        PLAYER_THREADS.set_function(lambda: sum(
+            thread.name.startswith('player-') for thread in threading.enumerate()
+        ))
+        FFMPEG_PROCESSES.set_function(self._ffmpeg_processes)
+        RADIO_LISTENERS.set_function(self._radio_listeners)
+        OVERLOAD_LEVEL.set_function(lambda: int(self.overload.level))
+        PLAYERS_SHED.set_function(lambda: len(self._shed))
+        HISTORY_EVENTS.set_function(lambda: self.history.events_written)
+        RESOLVE_CALLS.set_function(lambda: _RESOLVES.calls)
+        RESOLVE_COALESCED.set_function(lambda: _RESOLVES.coalesced)
+        if self.fetcher is not None:
+            STREAM_BYTES.set_function(lambda: self.fetcher.bytes_downloaded)
+            STREAM_REQUESTS.set_function(lambda: self.fetcher.requests)
+            STREAM_RETRIES.set_function(lambda: self.fetcher.retries)
+
+    @commands.Cog.listener()
+    async def on_app_command_completion(
+        self,
+        interaction: Interaction,
+        command: app_commands.Command
+    ) -> None:
+        if command.binding is not self:
+            return
+        name = command.qualified_name
+        TRACER.finish(interaction.id)
+        COMMANDS.inc(command=name, status='ok')
+        COMMAND_SECONDS.observe(
+            (discord.utils.utcnow() - interaction.created_at).total_seconds(),
+            command=name
+        )
+
+    async def cog_app_command_error(
+        self,
+        interaction: Interaction,
+        error: app_commands.AppCommandError
+    ) -> None:
+        status = 'check_failed' if isinstance(error, app_commands.CheckFailure) else 'error'
+        name = interaction.command.qualified_name if interaction.command else 'unknown'
+        TRACER.finish(interaction.id, status=status)
+        COMMANDS.inc(command=name, status=status)
+
+    async def interaction_check(self, interaction: Interaction) -> bool:
+        if interaction.command is not None:
+            TRACER.begin(interaction.id, interaction.command.qualified_name)
+        return True
+
+    @commands.command(name='latency')
+    @commands.is_owner()
+    async def _latency(self, ctx: commands.Context, command: Optional[str] = None):
+        """Show p50/p95/p99 latencies of app commands and their spans"""
+        percentiles = TRACER.percentiles(command)
+        if not percentiles:
+            await ctx.send('No traces recorded')
+            return
+        lines = []
+        for trace_name, spans in sorted(percentiles.items()):
+            lines.append(f'**/{trace_name}**')
+            for span_name, (p50, p95, p99) in spans.items():
+                lines.append(
+                    f'`{span_name}`: {p50 * 1000:.0f}ms / {p95 * 1000:.0f}ms / {p99 * 1000:.0f}ms'
+                )
+        await ctx.send('\n'.join(lines)[:2000])
+
+    @commands.command(name='profile')
+    @commands.is_owner()
+    async def _profile(self, ctx: commands.Context, seconds: float = 10.0, debug: bool = False):
+        """Sample every thread and the event loop, debug also reports slow callbacks"""
+        if self.profiler.running:
+            await ctx.send('Already profiling')
+            return
+        seconds = min(max(seconds, 1.0), 120.0)
+        await ctx.send(f'Profiling for {seconds:.0f}s')
+        report = await self.profiler.profile(seconds, debug=debug)
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f'profile-{int(time.time())}.folded')
+        await asyncio.get_running_loop().run_in_executor(None, report.write_collapsed, path)
+
+        lines = [f'**{report.samples} samples over {report.seconds:.1f}s**, written to `{path}`']
+        if report.thread_cpu:
+            lines.append('**CPU by thread**')
+            busiest = sorted(report.thread_cpu.items(), key=lambda item: item[1], reverse=True)
+            lines += [
+                f'`{name}`: {cpu / report.seconds:.0%}'
+                for name, cpu in busiest[:8]
+            ]
+        lines.append('**Most sampled functions**')
+        lines += [
+            f'`{function}`: {count / report.samples:.0%}'
+            for function, count in report.functions.most_common(8)
+        ]
+        p50, p99, worst = report.lag_percentiles()
+        lines.append(
+            f'**Event loop lag** {p50 * 1000:.1f}ms / {p99 * 1000:.1f}ms / max {worst * 1000:.1f}ms'
+        )
+        if debug:
+            lines[-1] += f', {len(report.slow_callbacks)} slow callbacks'
+            lines += [f'`{callback[:180]}`' for callback in report.slow_callbacks[:3]]
+        # discord rejects attachments over 8MB
+        attach = os.path.getsize(path) < 8 * 1024 * 1024
+        await ctx.send('\n'.join(lines)[:2000], file=discord.File(path) if attach else None)
+
+    async def cog_unload(self) -> None:
+        self.overload.stop()
+        # lift every measure, the next instance of the cog starts without overload
+        self._on_overload(self.overload.level, OverloadLevel.NORMAL)
+        self._restore_shed()
+        self.now_playing.stop()
+        await self.history.stop()
+        if getattr(self.client, 'closing', False) and self.fetcher is not None:
+            # not handed over to a reloaded cog
+            await self.fetcher.close()
+
+    def source_factory(self, song: Song) -> discord.AudioSource:
+        """Create the source of a song, piped through the fetcher if there is one."""
+        if self.fetcher is None:
+            return ffmpeg_source(song)
+        return PipedFFmpegPCMAudio(self.fetcher.open(song.url), **FFMPEG_PIPE_OPTIONS)
+
+    def _on_song_start(self, guild_id: int, song: Song) -> None:
+        self.history.record(self._event('start', guild_id, song))
+        self.client.loop.call_soon_threadsafe(self._song_started, guild_id, song)
+
+    def _on_song_end(self, guild_id: int, song: Song, position: float, end: SongEnd) -> None:
+        kind = {SongEnd.FINISHED: 'end', SongEnd.SKIPPED: 'skip', SongEnd.STOPPED: 'stop'}[end]
+        self.history.record(self._event(kind, guild_id, song, position))
+
+    @staticmethod
+    def _event(kind: str, guild_id: int, song: Song, position: float = 0.0) -> HistoryEvent:
+        return HistoryEvent(
+            kind=kind,
+            guild_id=guild_id,
+            key=song.video_id,
+            title=song.title,
+            channel_name=song.channel_name,
+            page_url=song.page_url,
+            position=position
+        )
+
+    async def _seed_song_index(self) -> None:
+        """
+        Aggregate the play history and add the songs played in it to the index.
+
+        Flushing starts once the log was read, so events aren't aggregated twice.
+        """
+        def read() -> dict[str, tuple[HistoryEvent, int]]:
+            played: dict[str, tuple[HistoryEvent, int]] = {}
+            for event in self.history.load():
+                if event.kind == 'start':
+                    played[event.key] = event, played.get(event.key, (None, 0))[1] + 1
+            return played
+
+        # the index isn't thread safe, only read the log in the executor
+        played = await asyncio.get_running_loop().run_in_executor(None, read)
+        for key, (event, plays) in played.items():
+            song = self.song_index.get(key) or Song(
+                title=event.title,
+                channel_name=event.channel_name,
+                thumbnail='',
+                page_url=event.page_url,
+                url='',
+                duration=0,
+                video_id=key
+            )
+            self.song_index.add(key, song, (event.title, event.channel_name), count=plays)
+        self.history.start()
+
+    def _song_started(self, guild_id: int, song: Song) -> None:
+        self.now_playing.mark_dirty(guild_id)
+        self.song_index.add(song.video_id, song, (song.title, song.channel_name))
+        player = self.players.get(guild_id)
+        if guild_id in self.autoplay and player is not None and self._is_last(player):
+            asyncio.ensure_future(self._autoplay_next(guild_id, player))
+
+    @staticmethod
+    def _is_last(player: Player) -> bool:
+        queue = player.queue
+        return queue.repeat == RepeatMode.Off and queue.index >= len(queue) - 1
+
+    def autoplay_candidate(self, player: Player) -> Optional[Song]:
+        """
+        Pick a song to continue with after the queue of a player ends.
+
+        Prefers the most played songs of the last played song's channel, then the
+        most played songs overall, skipping songs already in the queue.
+        """
+        queued = {song.video_id for song in player.queue.items}
+        current = player.song
+        queries = ([current.channel_name] if current is not None else []) + ['']
+        for query in queries:
+            for song in self.song_index.search(query, limit=len(queued) + 5):
+                if song.video_id not in queued:
+                    return song
+        return None
+
+    async def _autoplay_next(self, guild_id: int, player: Player) -> None:
+        """Queue an autoplay song and create its source shortly before it's needed."""
+        candidate = self.autoplay_candidate(player)
+        if candidate is None:
+            return
+        try:
+            # stream urls expire, look the song up again
+            song = await resolve(candidate.page_url)
+        except Exception as err:
+            print(f'Autoplay couldn\'t resolve {candidate!r}: {err!r}')
+            return
+        if self.players.get(guild_id) is not player or not self._is_last(player):
+            return
+        player.queue.append(song)
+        AUTOPLAY_SONGS.inc()
+        if not player.is_playing() and not player.is_paused():
+            # the queue ended before the song was found
+            player.play()
+            return
+
+        current = player.queue[-2]
+        await asyncio.sleep(max(0.0, current.duration - player.elapsed - self.PRELOAD_LEAD))
+        if (
+            self.players.get(guild_id) is not player
+            or player.song is not current
+            or player.queue.index != len(player.queue) - 2
+            or self.overload.level >= OverloadLevel.PAUSE_BACKGROUND
+        ):
+            return
+        await asyncio.get_running_loop().run_in_executor(None, player.preload, song)
+        AUTOPLAY_PRELOADS.inc()
 
     async def join_vc(self, vc: discord.VoiceChannel | discord.StageChannel) -> Player:
         """Join a voice channel."""
-        voice_client: discord.VoiceClient = await vc.connect(self_deaf=True)
-        self.players[voice_client.guild.id] = player = Player(voice_client)
+        with TRACER.span('voice.connect'):
+            voice_client: discord.VoiceClient = await vc.connect(self_deaf=True)
+        guild_id = voice_client.guild.id
+        self.players[guild_id] = player = Player(
+            voice_client,
+            on_song_start=partial(self._on_song_start, guild_id),
+            on_song_end=partial(self._on_song_end, guild_id),
+            source_factory=self.source_factory
+        )
+        player.limit_complexity(self._complexity_limit())
         return player
 
+    def now_playing_embed(self, player: Player) -> discord.Embed:
+        """Create the embed describing the currently playing song."""
+        if not player.queue:
+            return discord.Embed(
+                title='Currently playing',
+                description='Nothing in queue'
+            )
+        q = player.queue
+        index, song = q.index, q.current
+        elapsed = int(player.elapsed) if player.song is song else 0
+        state = 'Paused' if player.is_paused() else 'Playing'
+        description = f'''
+            {song}
+            by {song.channel_name}
+            {state}: {to_readable_time(elapsed) or '0s'} / {to_readable_time(song.duration)}
+            {to_ordinal(index + 1)} in queue
+        '''
+        return discord.Embed(
+            title='Currently playing',
+            description=description,
+        ).set_thumbnail(url=song.thumbnail)
+
     @app_commands.command(name='join')
     @app_commands.guild_only()
     @user_connected()
     async def _join(self, interaction: Interaction) -> None:
         """Join your channel"""
-        player = self.players.get(id, None)
+        player = self.players.get(interaction.guild_id, None)
         user = interaction.user
         if player is None:
+            refusal = self.session_refusal()
+            if refusal is not None:
+                await interaction.response.send_message(refusal, ephemeral=True)
+                return
             await self.join_vc(user.voice.channel)
             await interaction.response.send_message('Joining your voice channel', ephemeral=True)
             return
@@ -308,12 +1295,14 @@ class Music(commands.Cog):
     @app_commands.guild_only()
     async def _leave(self, interaction: Interaction) -> None:
         """Leave the channel and remove the queue"""
-        player = self.players[interaction.guild_id]
+        # removed first, on_voice_state_update also removes it once disconnected
+        player = self._remove_player(interaction.guild_id)
+        if player is None:
+            await interaction.response.send_message('Not playing anything', ephemeral=True)
+            return
+        player.queue.clear()
         await player.leave()
         await interaction.response.send_message('Leaving')
-        player = self.players[interaction.guild_id]
-        player.queue.clear()
-        del self.players[interaction.guild_id]
 
     @app_commands.command(name='add')
     @app_commands.describe(query='What to search for')
@@ -321,21 +1310,42 @@ class Music(commands.Cog):
     @user_connected()
     async def _add(self, interaction: Interaction, query: str) -> None:
         """Add a song to the queue and start playing if not already started"""
-        await interaction.response.defer()
+        with TRACER.span('response.defer'):
+            await interaction.response.defer()
         player = self.players.get(interaction.guild_id, None)
         if player is None:
+            refusal = self.session_refusal()
+            if refusal is not None:
+                await interaction.edit_original_message(content=refusal)
+                return
             player = await self.join_vc(interaction.user.voice.channel)
         try:
-            song = find_video(query)
-        except VideoNotFoundError:
-            await interaction.edit_original_message(
-                content=f'Couldn\'t find any videos from query `{query}`'
-            )
+            with TRACER.span('resolve'):
+                song = await resolve(query)
+        except ResolveError as err:
+            await interaction.edit_original_message(content=resolve_failure_message(query, err))
             return
         player.queue.append(song)
+        self.history.record(self._event('add', interaction.guild_id, song))
         if not player.is_playing():
             player.play()
-        await interaction.edit_original_message(content=f'Added `{song.title}` to queue')
+        with TRACER.span('response.edit'):
+            await interaction.edit_original_message(content=f'Added `{song.title}` to queue')
+
+    @_add.autocomplete('query')
+    async def _add_query_autocomplete(
+        self,
+        interaction: Interaction,
+        current: str
+    ) -> list[app_commands.Choice[str]]:
+        """Suggest previously played songs, selecting one adds it by its url"""
+        return [
+            app_commands.Choice(
+                name=f'{song.title} - {song.channel_name}'[:100],
+                value=song.page_url
+            )
+            for song in self.song_index.search(current, limit=25)
+        ]
 
     @app_commands.command(name='loop')
     @app_commands.describe(mode='Looping mode')
@@ -345,10 +1355,34 @@ class Music(commands.Cog):
         """Set the looping mode"""
         player = self.players[interaction.guild_id]
         player.queue.repeat = mode
-        await interaction.response.send_message(f'Looping set to `{mode.value}`')
+        message = f'Looping set to `{mode.value}`'
+        if mode != RepeatMode.Off and interaction.guild_id in self.autoplay:
+            message += ', autoplay only continues once looping is off'
+        await interaction.response.send_message(message)
         if player.queue and not player.voice_client.is_playing():
             player.play()
 
+    @app_commands.command(name='autoplay')
+    @app_commands.describe(enabled='Whether to keep playing related songs')
+    @app_commands.guild_only()
+    @user_and_bot_connected()
+    async def _autoplay(self, interaction: Interaction, enabled: bool) -> None:
+        """Keep playing related songs when the queue ends, turns looping off"""
+        player = self.players[interaction.guild_id]
+        if not enabled:
+            self.autoplay.discard(interaction.guild_id)
+            await interaction.response.send_message('Autoplay disabled')
+            return
+        self.autoplay.add(interaction.guild_id)
+        if player.queue.repeat != RepeatMode.Off:
+            # a looping queue never ends
+            player.queue.repeat = RepeatMode.Off
+            await interaction.response.send_message('Autoplay enabled, looping turned off')
+        else:
+            await interaction.response.send_message('Autoplay enabled')
+        if player.queue and self._is_last(player):
+            asyncio.ensure_future(self._autoplay_next(interaction.guild_id, player))
+
     @app_commands.command(name='shuffle')
     @app_commands.guild_only()
     @user_and_bot_connected()
@@ -383,24 +1417,41 @@ class Music(commands.Cog):
     @app_commands.guild_only()
     @bot_connected()
     async def _current(self, interaction: Interaction):
-        """Currently playing song"""
+        """Currently playing song, the message keeps updating while playing"""
         player = self.players[interaction.guild_id]
         if not player.queue:
             await interaction.response.send_message('Nothing in queue')
             return
-        q = player.queue
-        index, song = q.index, q.current
+        await interaction.response.send_message(embed=self.now_playing_embed(player))
+        message = await interaction.original_message()
+        self.now_playing.register(
+            interaction.guild_id,
+            message,
+            lambda: {'embed': self.now_playing_embed(player)},
+            refresh=self.NOW_PLAYING_REFRESH
+        )
+
+    @app_commands.command(name='stats')
+    @app_commands.guild_only()
+    async def _stats(self, interaction: Interaction) -> None:
+        """Most played songs and listening stats of this server"""
+        stats = self.history.stats(interaction.guild_id)
+        if not stats.plays:
+            await interaction.response.send_message('Nothing played here yet')
+            return
+        top = '\n'.join(
+            f'**{index}. **{title} ({plays} plays)'
+            for index, (title, plays) in enumerate(self.history.top(interaction.guild_id), start=1)
+        )
         description = f'''
-            {song}
-            by {song.channel_name}
-            Duration: {to_readable_time(song.duration)}
-            {to_ordinal(index + 1)} in queue
+            {stats.plays} songs played for {to_readable_time(int(stats.seconds)) or '0s'}
+            {stats.skips} skipped, {stats.removals} removed from the queue
+
+            {top}
         '''
-        embed = discord.Embed(
-            title='Currently playing',
-            description=description,
-        ).set_thumbnail(url=song.thumbnail)
-        await interaction.response.send_message(embed=embed)
+        await interaction.response.send_message(
+            embed=discord.Embed(title='Stats', description=description)
+        )
 
     @app_commands.command(name='skip')
     @app_commands.describe(offset='How far to skip')
@@ -439,6 +1490,7 @@ class Music(commands.Cog):
         """Pause playback"""
         player = self.players[interaction.guild_id]
         player.voice_client.pause()
+        self.now_playing.mark_dirty(interaction.guild_id)
         await interaction.response.send_message('Paused')
 
     @app_commands.command(name='resume')
@@ -448,6 +1500,7 @@ class Music(commands.Cog):
         """Resume playback"""
         player = self.players[interaction.guild_id]
         player.voice_client.resume()
+        self.now_playing.mark_dirty(interaction.guild_id)
         await interaction.response.send_message('Resumed')
 
     @app_commands.command(name='remove')
@@ -465,6 +1518,7 @@ class Music(commands.Cog):
             )
             return
         removed = player.queue.pop(position - 1)
+        self.history.record(self._event('remove', interaction.guild_id, removed))
         await interaction.response.send_message(f'Removed `{removed.title}`')
 
     @app_commands.command(name='clear')
@@ -476,6 +1530,165 @@ class Music(commands.Cog):
         player.queue.clear()
         await interaction.response.send_message('Cleared the queue')
 
+    def _unsubscribe(self, guild_id: int) -> Optional[discord.VoiceClient]:
+        station = self.station_of(guild_id)
+        if station is None:
+            return None
+        voice_client = station.voice_client.unsubscribe(guild_id)
+        if not station.voice_client.subscribers:
+            # nobody is listening, don't decode and encode for nothing
+            station.pause()
+        return voice_client
+
+    def _subscribe(self, station: Player, voice_client: discord.VoiceClient) -> None:
+        station.voice_client.subscribe(voice_client)
+        if not station.is_alive():
+            station.play()
+        elif station.is_paused():
+            station.resume()
+
+    @radio.command(name='add')
+    @app_commands.describe(station='Name of the station', query='What to search for')
+    async def _radio_add(self, interaction: Interaction, station: str, query: str) -> None:
+        """Add a song to a station, creating it if it doesn't exist"""
+        if not await self.client.is_owner(interaction.user):
+            await interaction.response.send_message(
+                'Only the bot owner can manage stations',
+                ephemeral=True
+            )
+            return
+        await interaction.response.defer()
+        try:
+            song = await resolve(query)
+        except ResolveError as err:
+            await interaction.edit_original_message(content=resolve_failure_message(query, err))
+            return
+        player = self.stations.get(station)
+        if player is None:
+            self.stations[station] = player = Player(
+                BroadcastClient(station, self.client.loop),
+                queue=Queue([song], repeat=RepeatMode.All),
+                source_factory=self.source_factory
+            )
+            player.limit_complexity(self._complexity_limit())
+            await interaction.edit_original_message(
+                content=f'Created station `{station}` playing `{song.title}`'
+            )
+            return
+        player.queue.append(song)
+        await interaction.edit_original_message(
+            content=f'Added `{song.title}` to station `{station}`'
+        )
+
+    @radio.command(name='tune')
+    @app_commands.describe(station='Name of the station')
+    @user_connected()
+    async def _radio_tune(self, interaction: Interaction, station: str) -> None:
+        """Play a station in your channel"""
+        player = self.stations.get(station)
+        if player is None:
+            await interaction.response.send_message(
+                f'There is no station named `{station}`',
+                ephemeral=True
+            )
+            return
+        if interaction.guild_id in self.players:
+            await interaction.response.send_message(
+                'I\'m already playing a queue here, use /leave first',
+                ephemeral=True
+            )
+            return
+        voice_client = self._unsubscribe(interaction.guild_id)
+        if voice_client is None:
+            refusal = self.session_refusal()
+            if refusal is not None:
+                await interaction.response.send_message(refusal, ephemeral=True)
+                return
+            await interaction.response.defer()
+            with TRACER.span('voice.connect'):
+                voice_client = await interaction.user.voice.channel.connect(self_deaf=True)
+        else:
+            await interaction.response.defer()
+        self._subscribe(player, voice_client)
+        await interaction.edit_original_message(content=f'Tuned in to `{station}`')
+
+    @radio.command(name='remove')
+    @app_commands.describe(station='Name of the station')
+    async def _radio_remove(self, interaction: Interaction, station: str) -> None:
+        """Remove a station, disconnecting every server tuned in to it"""
+        if not await self.client.is_owner(interaction.user):
+            await interaction.response.send_message(
+                'Only the bot owner can manage stations',
+                ephemeral=True
+            )
+            return
+        player = self.stations.pop(station, None)
+        if player is None:
+            await interaction.response.send_message(
+                f'There is no station named `{station}`',
+                ephemeral=True
+            )
+            return
+        await player.leave()
+        await interaction.response.send_message(f'Removed station `{station}`')
+
+    @_radio_add.autocomplete('station')
+    @_radio_tune.autocomplete('station')
+    @_radio_remove.autocomplete('station')
+    async def _station_autocomplete(
+        self,
+        interaction: Interaction,
+        current: str
+    ) -> list[app_commands.Choice[str]]:
+        """Suggest existing stations"""
+        current = current.casefold()
+        return [
+            app_commands.Choice(name=name, value=name)
+            for name in sorted(self.stations)
+            if current in name.casefold()
+        ][:25]
+
+    @radio.command(name='leave')
+    async def _radio_leave(self, interaction: Interaction) -> None:
+        """Stop playing the station and leave the channel"""
+        voice_client = self._unsubscribe(interaction.guild_id)
+        if voice_client is None:
+            await interaction.response.send_message(
+                'Not tuned in to a station',
+                ephemeral=True
+            )
+            return
+        await voice_client.disconnect()
+        await interaction.response.send_message('Leaving')
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(
+        self,
+        before: discord.abc.GuildChannel,
+        after: discord.abc.GuildChannel
+    ) -> None:
+        if getattr(before, 'bitrate', None) == getattr(after, 'bitrate', None):
+            return
+        player = self.players.get(after.guild.id)
+        if player is not None and player.voice_client.channel == after:
+            player.configure_encoder(EncoderSettings.for_bitrate(after.bitrate))
+
+    @app_commands.command(name='encoder')
+    @app_commands.guild_only()
+    @bot_connected()
+    async def _encoder(self, interaction: Interaction) -> None:
+        """Show the audio encoder settings used for this server"""
+        player = self.players.get(interaction.guild_id)
+        if player is None:
+            player = self.station_of(interaction.guild_id)
+        if player is None:
+            await interaction.response.send_message('Not playing anything', ephemeral=True)
+            return
+        await interaction.response.send_message(
+            f'Encoding at {player.encoder_settings}',
+            ephemeral=True
+        )
+
     @commands.Cog.listener()
     async def on_voice_state_update(
         self,
@@ -484,8 +1697,17 @@ class Music(commands.Cog):
         after: discord.VoiceState
     ):
         if member.bot:
-            if member.id == self.client.user.id and after.channel is None:
-                del self.players[member.guild.id, None]
+            if member.id != self.client.user.id:
+                return
+            if after.channel is None:
+                player = self._remove_player(member.guild.id)
+                if player is not None:
+                    player.shutdown()
+                self._unsubscribe(member.guild.id)
+            elif before.channel != after.channel and member.guild.id in self.players:
+                self.players[member.guild.id].configure_encoder(
+                    EncoderSettings.for_bitrate(after.channel.bitrate)
+                )
             return
         player = self.players.get(member.guild.id, None)
         if player is None:
@@ -499,8 +1721,12 @@ class Music(commands.Cog):
 
 
 async def setup(client: commands.Bot, guilds: list[int]) -> None:
-    await client.add_cog(Music(client), guilds=guilds)
+    state = getattr(client, 'plugin_state', {}).pop(__name__, {})
+    await client.add_cog(Music(client, **state), guilds=guilds)
 
 
 async def teardown(client: commands.Bot, guilds: list[int]) -> None:
+    music: Music = client.get_cog('Music')
+    if hasattr(client, 'plugin_state'):
+        client.plugin_state[__name__] = music.export_state()
     await client.remove_cog('Music', guilds=guilds)
@@ -0,0 +1,185 @@
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import wait
+from multiprocessing.connection import Listener
+from typing import Any, Callable, Optional
+from utils import IPCChannel, IPCError
+
+
+__all__ = [
+    'Supervisor',
+    'split_shards'
+]
+
+
+def split_shards(shard_count: int, workers: int) -> list[list[int]]:
+    """Split shard ids as evenly as possible between `workers` processes."""
+    return [
+        list(range(worker, shard_count, workers))
+        for worker in range(min(workers, shard_count))
+    ]
+
+
+class Supervisor:
+    """
+    Runs the bot's shards in worker processes and restarts them when they exit.
+
+    Workers are started with `target(worker_id, shard_ids, shard_count, address, authkey)`
+    and are expected to connect back to `address` and send `{'worker': worker_id}`
+    before using the connection as an `IPCChannel`.
+
+    Requests workers can make:
+    - `broadcast`: run `data['op']` on every worker, returns the list of results
+    - `drain`: drain and restart the worker `data['worker']`
+
+    Parameters
+    ----------
+    target: `Callable[..., Any]`
+        The function run in each worker process
+    shard_count: `int`
+        The total amount of shards
+    workers: `int`
+        The amount of worker processes
+    restart_delay: `float`
+        Seconds to wait before restarting a worker which exited
+    request_timeout: `float`
+        Seconds to wait for workers to reply to a broadcast
+    """
+
+    def __init__(
+        self,
+        target: Callable[..., Any],
+        *,
+        shard_count: int,
+        workers: int,
+        restart_delay: float = 5.0,
+        request_timeout: float = 10.0
+    ) -> None:
+        self._target = target
+        self._shard_count = shard_count
+        self._shards = split_shards(shard_count, workers)
+        self._restart_delay = restart_delay
+        self._request_timeout = request_timeout
+        self._context = multiprocessing.get_context('spawn')
+        self._authkey = os.urandom(32)
+        self._listener = Listener(('localhost', 0), authkey=self._authkey)
+        self._processes: dict[int, multiprocessing.Process] = {}
+        self._channels: dict[int, IPCChannel] = {}
+        self._draining: set[int] = set()
+        self._stopping = threading.Event()
+
+    def _spawn(self, worker: int) -> None:
+        process = self._context.Process(
+            target=self._target,
+            args=(
+                worker,
+                self._shards[worker],
+                self._shard_count,
+                self._listener.address,
+                self._authkey
+            ),
+            name=f'shard-worker-{worker}',
+            daemon=False
+        )
+        process.start()
+        self._processes[worker] = process
+        print(f'started worker {worker} with shards {self._shards[worker]}')
+
+    def _accept(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                connection = self._listener.accept()
+                worker = connection.recv()['worker']
+            except (OSError, EOFError):
+                continue
+            channel = IPCChannel(connection, self._handle)
+            self._channels[worker] = channel
+            channel.start()
+
+    def _handle(self, op: str, data: Any) -> Any:
+        if op == 'broadcast':
+            return self.broadcast(data['op'], data.get('data'))
+        if op == 'drain':
+            threading.Thread(target=self.drain, args=(data['worker'],), daemon=True).start()
+            return None
+        raise ValueError(f'Unknown operation {op}')
+
+    def broadcast(self, op: str, data: Any = None) -> list[Any]:
+        """Run `op` on every connected worker and return their results."""
+        futures = []
+        for channel in list(self._channels.values()):
+            try:
+                futures.append(channel.request(op, data))
+            except IPCError:
+                continue
+        done, _ = wait(futures, timeout=self._request_timeout)
+        return [
+            future.result() for future in futures
+            if future in done and future.exception() is None
+        ]
+
+    def drain(self, worker: int, timeout: Optional[float] = None) -> None:
+        """
+        Ask a worker to finish its playback and exit, then restart it.
+
+        The worker is killed if it doesn't exit within `timeout` seconds.
+        """
+        self._draining.add(worker)
+        try:
+            channel = self._channels.pop(worker, None)
+            if channel is not None:
+                try:
+                    channel.request('drain').result(timeout)
+                except Exception:
+                    pass
+                channel.close()
+            process = self._processes[worker]
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+            if not self._stopping.is_set():
+                self._spawn(worker)
+        finally:
+            self._draining.discard(worker)
+
+    def _monitor(self) -> None:
+        exited: dict[int, float] = {}
+        while not self._stopping.wait(1.0):
+            now = time.monotonic()
+            for worker, process in list(self._processes.items()):
+                if process.is_alive() or worker in self._draining:
+                    continue
+                if worker not in exited:
+                    print(f'worker {worker} exited with code {process.exitcode}')
+                    self._channels.pop(worker, None)
+                    exited[worker] = now
+                elif now - exited[worker] >= self._restart_delay:
+                    del exited[worker]
+                    self._spawn(worker)
+
+    def stop(self, *_) -> None:
+        """Drain every worker and stop."""
+        self._stopping.set()
+
+    def run(self) -> None:
+        """Start the workers and supervise them until stopped."""
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        threading.Thread(target=self._accept, daemon=True).start()
+        for worker in range(len(self._shards)):
+            self._spawn(worker)
+        self._monitor()
+
+        threads = [
+            threading.Thread(target=self.drain, args=(worker, 30.0))
+            for worker in list(self._processes)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self._listener.close()
@@ -1,5 +1,17 @@
 '''Various utility functions and classes used for the bots'''
 from .checks import *
+from .concurrency import *
+from .encoder import *
+from .fetcher import *
+from .framebuffer import *
+from .history import *
+from .index import *
+from .ipc import *
 from .menu import *
+from .metrics import *
+from .overload import *
+from .profiler import *
 from .queue import *
+from .scheduler import *
+from .tracing import *
 from .utils import *
@@ -1,4 +1,6 @@
 from discord import app_commands, Interaction
+from typing import Awaitable, Callable
+from .tracing import TRACER
 
 
 __all__ = [
@@ -8,6 +10,16 @@ __all__ = [
 ]
 
 
+def _traced_check(
+    name: str,
+    predicate: Callable[[Interaction], Awaitable[bool]]
+) -> Callable:
+    async def traced(interaction: Interaction) -> bool:
+        with TRACER.span(f'check.{name}'):
+            return await predicate(interaction)
+    return app_commands.check(traced)
+
+
 def user_and_bot_connected():
     """Fails if either the user or bot aren't connected to the same channel."""
     async def predicate(interaction: Interaction) -> bool:
@@ -23,7 +35,7 @@ def user_and_bot_connected():
             await interaction.response.send_message(msg, ephemeral=True)
             return False
         return True
-    return app_commands.check(predicate)
+    return _traced_check('user_and_bot_connected', predicate)
 
 
 def user_connected():
@@ -36,7 +48,7 @@ def user_connected():
             )
             return False
         return True
-    return app_commands.check(predicate)
+    return _traced_check('user_connected', predicate)
 
 
 def bot_connected():
@@ -49,4 +61,4 @@ def bot_connected():
             )
             return False
         return True
-    return app_commands.check(predicate)
+    return _traced_check('bot_connected', predicate)
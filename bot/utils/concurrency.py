@@ -0,0 +1,125 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+
+__all__ = [
+    'SingleFlight',
+    'RateLimiter'
+]
+
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into a single call.
+
+    While a call for a key is running, later calls for that key wait for its
+    result instead of starting their own, every waiter gets the same result
+    or exception. Cancelling a waiter doesn't cancel the shared call.
+
+    Attributes
+    ----------
+    calls: `int`
+        The amount of calls which were started
+    coalesced: `int`
+        The amount of calls which waited for an already running call
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def run(self, key: Hashable, function: Callable[[], Awaitable[T]]) -> T:
+        """Await `function()`, or the running call for `key` if there is one."""
+        future = self._calls.get(key)
+        if future is None:
+            future = self._calls[key] = asyncio.ensure_future(function())
+            future.add_done_callback(lambda done: self._forget(key, done))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.cancelled():
+            # mark the exception as retrieved in case every waiter was cancelled
+            future.exception()
+
+
+class RateLimiter:
+    """
+    A token bucket limiting how often an upstream service is called.
+
+    Callers await `acquire` before every request. When the upstream signals
+    throttling, `backoff` blocks every caller for an exponentially growing
+    delay until `reset_backoff` is called after a successful request.
+
+    Parameters
+    ----------
+    rate: `float`
+        The amount of requests allowed per second on average
+    burst: `int`
+        The amount of requests allowed at once
+    min_backoff: `float`
+        The first backoff delay in seconds
+    max_backoff: `float`
+        The maximum backoff delay in seconds
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        *,
+        burst: int = 1,
+        min_backoff: float = 1.0,
+        max_backoff: float = 60.0
+    ) -> None:
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._min_backoff = min_backoff
+        self._max_backoff = max_backoff
+        self._backoff = 0.0
+        self._blocked_until = 0.0
+
+    async def acquire(self) -> None:
+        """Wait until a request is allowed."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._tokens = min(
+                    self._burst,
+                    self._tokens + (now - self._updated) * self._rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+    def backoff(self) -> float:
+        """Block requests for the next backoff delay and return it."""
+        self._backoff = min(
+            self._max_backoff,
+            self._backoff * 2 if self._backoff else self._min_backoff
+        )
+        self._blocked_until = time.monotonic() + self._backoff
+        return self._backoff
+
+    def reset_backoff(self) -> None:
+        """Reset the backoff delay after a successful request."""
+        self._backoff = 0.0
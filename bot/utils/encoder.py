@@ -0,0 +1,78 @@
+from attrs import define, evolve, field, validators
+from discord import opus
+from discord.opus import Encoder as OpusEncoder
+
+
+__all__ = [
+    'EncoderSettings'
+]
+
+
+# not exposed by discord.opus, from opus_defines.h
+CTL_SET_COMPLEXITY = 4010
+
+
+@define(frozen=True, kw_only=True)
+class EncoderSettings:
+    """
+    Settings of an opus encoder.
+
+    Use `for_bitrate` to get the settings matching a voice channel.
+
+    Attributes
+    ----------
+    bitrate: `int`
+        The target bitrate in kbps
+    complexity: `int`
+        The computational complexity from 0 to 10, lower uses less CPU
+    bandwidth: `str`
+        The audio bandwidth, one of narrow, medium, wide, superwide and full
+    fec: `bool`
+        Whether forward error correction is enabled
+    packet_loss: `float`
+        The expected packet loss from 0 to 1, FEC spends more bits the higher it is
+    """
+
+    bitrate: int = field(default=128, validator=validators.in_(range(16, 513)))
+    complexity: int = field(default=10, validator=validators.in_(range(11)))
+    bandwidth: str = field(default='full', validator=validators.in_(opus.band_ctl))
+    fec: bool = True
+    packet_loss: float = 0.15
+
+    @classmethod
+    def for_bitrate(cls, bitrate: int) -> 'EncoderSettings':
+        """
+        Get the settings for a voice channel with the given bitrate in bps.
+
+        Encoding above the channel's bitrate only costs CPU and upload,
+        Discord doesn't send listeners more than the channel allows.
+        Low bitrates get a narrower bandwidth, a lower complexity and no FEC
+        since the redundant data would take most of the few available bits.
+        """
+        kbps = max(16, min(512, bitrate // 1000))
+        if kbps < 32:
+            return cls(bitrate=kbps, complexity=5, bandwidth='wide', fec=False, packet_loss=0.0)
+        if kbps < 64:
+            return cls(bitrate=kbps, complexity=7, bandwidth='superwide', packet_loss=0.05)
+        if kbps < 128:
+            return cls(bitrate=kbps, complexity=9, packet_loss=0.1)
+        return cls(bitrate=kbps)
+
+    def with_complexity(self, complexity: int) -> 'EncoderSettings':
+        """Get a copy of the settings with another complexity."""
+        return evolve(self, complexity=complexity)
+
+    def apply(self, encoder: OpusEncoder) -> None:
+        """Configure `encoder`, must not be called while it's encoding."""
+        encoder.set_bitrate(self.bitrate)
+        encoder.set_bandwidth(self.bandwidth)
+        encoder.set_fec(self.fec)
+        encoder.set_expected_packet_loss_percent(self.packet_loss)
+        opus._lib.opus_encoder_ctl(encoder._state, CTL_SET_COMPLEXITY, self.complexity)
+
+    def __str__(self) -> str:
+        fec = f'FEC at {self.packet_loss:.0%} loss' if self.fec else 'no FEC'
+        return (
+            f'{self.bitrate}kbps, complexity {self.complexity}, '
+            f'{self.bandwidth} bandwidth, {fec}'
+        )
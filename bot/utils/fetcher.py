@@ -0,0 +1,224 @@
+import aiohttp
+import asyncio
+import io
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Deque, Optional
+
+
+__all__ = [
+    'PipeStream',
+    'StreamFetcher'
+]
+
+
+class PipeStream(io.RawIOBase):
+    """
+    A readable stream filled by a download running on an event loop.
+
+    Reads block the calling thread until data is available, the download
+    pauses while more than `read_ahead` bytes are buffered.
+
+    Parameters
+    ----------
+    loop: `asyncio.AbstractEventLoop`
+        The loop the download runs on
+    read_ahead: `int`
+        The amount of bytes buffered before the download pauses
+
+    Attributes
+    ----------
+    offset: `int`
+        The amount of bytes downloaded so far
+    error: `Optional[BaseException]`
+        The error the download failed with, reads return EOF after a failure
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, read_ahead: int) -> None:
+        super().__init__()
+        self._loop = loop
+        self._read_ahead = read_ahead
+        self._chunks: Deque[bytes] = deque()
+        self._buffered = 0
+        self._condition = threading.Condition()
+        self._space = asyncio.Event()
+        self._eof = False
+        self.offset = 0
+        self.error: Optional[BaseException] = None
+        self.download: Optional[Future] = None
+
+    def readable(self) -> bool:
+        return True
+
+    @property
+    def buffered(self) -> int:
+        """The amount of bytes downloaded but not read yet."""
+        return self._buffered
+
+    def read(self, size: int = -1) -> bytes:
+        """Read up to `size` bytes, blocking until data is available."""
+        with self._condition:
+            while not self._chunks and not self._eof and not self.closed:
+                self._condition.wait()
+            parts = []
+            remaining = size if size >= 0 else self._buffered
+            while self._chunks and remaining > 0:
+                chunk = self._chunks.popleft()
+                if len(chunk) > remaining:
+                    self._chunks.appendleft(chunk[remaining:])
+                    chunk = chunk[:remaining]
+                parts.append(chunk)
+                remaining -= len(chunk)
+                self._buffered -= len(chunk)
+            if self._buffered < self._read_ahead and not self._space.is_set():
+                self._loop.call_soon_threadsafe(self._space.set)
+        return b''.join(parts)
+
+    def close(self) -> None:
+        """Stop the download and wake up blocked readers."""
+        if self.download is not None:
+            self.download.cancel()
+        with self._condition:
+            super().close()
+            self._condition.notify_all()
+
+    def _feed(self, data: bytes) -> None:
+        with self._condition:
+            self._chunks.append(data)
+            self._buffered += len(data)
+            self.offset += len(data)
+            if self._buffered >= self._read_ahead:
+                self._space.clear()
+            self._condition.notify_all()
+
+    def _finish(self, error: Optional[BaseException] = None) -> None:
+        with self._condition:
+            self._eof = True
+            self.error = error
+            self._condition.notify_all()
+
+    async def _wait_for_space(self) -> None:
+        if self._buffered >= self._read_ahead:
+            await self._space.wait()
+
+
+class StreamFetcher:
+    """
+    Downloads audio streams with range requests over a shared connection pool.
+
+    Streams are downloaded in `chunk_size` ranges, a range which fails midway
+    is resumed from the last received byte.
+
+    Parameters
+    ----------
+    loop: `asyncio.AbstractEventLoop`
+        The loop downloads run on
+    chunk_size: `int`
+        The size of the ranges requested at once
+    read_ahead: `int`
+        The amount of bytes buffered per stream
+    retries: `int`
+        The amount of consecutive failed requests before a download fails
+    connections: `int`
+        The maximum amount of open connections
+
+    Attributes
+    ----------
+    bytes_downloaded: `int`
+        The amount of bytes downloaded by every stream
+    requests: `int`
+        The amount of HTTP requests made
+    retries: `int`
+        The amount of requests retried after a failure
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        *,
+        chunk_size: int = 1 << 20,
+        read_ahead: int = 1 << 22,
+        retries: int = 5,
+        connections: int = 100
+    ) -> None:
+        self._loop = loop
+        self._chunk_size = chunk_size
+        self._read_ahead = read_ahead
+        self._max_retries = retries
+        self._connections = connections
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.bytes_downloaded = 0
+        self.requests = 0
+        self.retries = 0
+
+    def open(self, url: str) -> PipeStream:
+        """Start downloading `url`, can be called from any thread."""
+        stream = PipeStream(self._loop, self._read_ahead)
+        stream.download = asyncio.run_coroutine_threadsafe(
+            self._download(url, stream),
+            self._loop
+        )
+        return stream
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._connections),
+                timeout=aiohttp.ClientTimeout(sock_connect=10, sock_read=30)
+            )
+        return self._session
+
+    async def _download_range(self, url: str, stream: PipeStream) -> Optional[int]:
+        offset = stream.offset
+        headers = {'Range': f'bytes={offset}-{offset + self._chunk_size - 1}'}
+        self.requests += 1
+        async with self._get_session().get(url, headers=headers) as response:
+            if response.status == 416:
+                return offset
+            response.raise_for_status()
+            if response.status == 206:
+                content_range = response.headers.get('Content-Range', '')
+                total = content_range.rpartition('/')[2]
+                total = int(total) if total.isdigit() else None
+            else:
+                # the server ignored the range and sends the whole stream,
+                # skip what was already received
+                total = None
+                if offset:
+                    await response.content.readexactly(offset)
+            async for data in response.content.iter_chunked(1 << 16):
+                stream._feed(data)
+                self.bytes_downloaded += len(data)
+                await stream._wait_for_space()
+            if response.status != 206:
+                total = stream.offset
+        return total
+
+    async def _download(self, url: str, stream: PipeStream) -> None:
+        total, failures = None, 0
+        try:
+            while total is None or stream.offset < total:
+                await stream._wait_for_space()
+                try:
+                    total = await self._download_range(url, stream)
+                    failures = 0
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    failures += 1
+                    if failures > self._max_retries:
+                        raise
+                    self.retries += 1
+                    await asyncio.sleep(min(5.0, 0.25 * 2 ** failures))
+        except asyncio.CancelledError:
+            stream._finish()
+            raise
+        except Exception as err:
+            stream._finish(err)
+        else:
+            stream._finish()
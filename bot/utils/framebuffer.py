@@ -0,0 +1,182 @@
+import ctypes
+import threading
+from discord import AudioSource, FFmpegPCMAudio
+from discord.opus import Encoder as OpusEncoder
+from typing import Any, Callable, Optional, Union
+
+
+__all__ = [
+    'FrameBuffer'
+]
+
+
+Frame = Union[ctypes.Array, bytes]
+
+
+class FrameBuffer:
+    """
+    A preallocated ring buffer of audio frames, filled ahead of time by a reader thread.
+
+    PCM frames are read straight into the buffer and handed out as ctypes
+    arrays over it, which the opus encoder accepts without copying. A frame
+    handed out by `get` stays valid until the next call to `get`.
+    Opus packets are passed through as the source returns them.
+
+    Parameters
+    ----------
+    depth: `int`
+        The amount of frames read ahead
+    frame_size: `int`
+        The size of a PCM frame in bytes
+    name: `Optional[str]`
+        The name of the reader thread
+    on_underrun: `Optional[Callable[[], Any]]`
+        A function run on every underrun, from the thread calling `get`
+
+    Attributes
+    ----------
+    underruns: `int`
+        The amount of times a frame was requested before it was read,
+        not counting the first frame of a source
+    """
+
+    def __init__(
+        self,
+        *,
+        depth: int = 50,
+        frame_size: int = OpusEncoder.FRAME_SIZE,
+        name: Optional[str] = None,
+        on_underrun: Optional[Callable[[], Any]] = None
+    ) -> None:
+        if depth < 2:
+            raise ValueError('depth must be at least 2')
+        self.depth = depth
+        self.frame_size = frame_size
+        self._buffer = bytearray(frame_size * depth)
+        view = memoryview(self._buffer)
+        self._views = [view[i * frame_size: (i + 1) * frame_size] for i in range(depth)]
+        self._frames = [
+            (ctypes.c_char * frame_size).from_buffer(self._buffer, i * frame_size)
+            for i in range(depth)
+        ]
+        self._packets: list[Optional[bytes]] = [None] * depth
+        self._condition = threading.Condition()
+        self._source: Optional[AudioSource] = None
+        self._generation = 0
+        self._written = 0
+        self._consumed = 0
+        self._eof = True
+        self._closed = False
+        self.underruns = 0
+        self.on_underrun = on_underrun
+        self._name = name
+        self._reader: Optional[threading.Thread] = None
+
+    @property
+    def buffered(self) -> int:
+        """The amount of frames read but not handed out yet."""
+        return self._written - self._consumed
+
+    def attach(self, source: AudioSource) -> None:
+        """
+        Drop buffered frames and start reading from `source`.
+
+        The reader thread is started on the first call. Does nothing once the
+        buffer is closed, `get` keeps returning None.
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._source = source
+            self._reset()
+            if self._reader is None:
+                self._reader = threading.Thread(target=self._fill, name=self._name, daemon=True)
+                self._reader.start()
+
+    def detach(self) -> None:
+        """Drop buffered frames and stop reading, `get` returns None until a source is attached."""
+        with self._condition:
+            self._source = None
+            self._reset()
+
+    def close(self) -> None:
+        """Detach and stop the reader thread, the buffer can't be attached to afterwards."""
+        with self._condition:
+            self._closed = True
+            self.detach()
+
+    def _reset(self) -> None:
+        self._generation += 1
+        self._written = self._consumed = 0
+        self._eof = self._source is None
+        self._condition.notify_all()
+
+    def get(self) -> Optional[Frame]:
+        """Get the next frame, blocking until it's read, None when the source ended."""
+        with self._condition:
+            if self._written == self._consumed and not self._eof:
+                if self._consumed:
+                    self.underruns += 1
+                    if self.on_underrun is not None:
+                        self.on_underrun()
+                while self._written == self._consumed and not self._eof:
+                    self._condition.wait()
+            if self._written == self._consumed:
+                return None
+            index = self._consumed % self.depth
+            self._consumed += 1
+            self._condition.notify_all()
+            packet = self._packets[index]
+            return self._frames[index] if packet is None else packet
+
+    def _has_space(self) -> bool:
+        # the frame handed out last is still in use
+        return self._written - self._consumed < self.depth - 1
+
+    def _read_into(self, source: AudioSource, index: int) -> tuple[bool, Optional[bytes]]:
+        if isinstance(source, FFmpegPCMAudio):
+            view, filled = self._views[index], 0
+            try:
+                while filled < self.frame_size:
+                    read = source._stdout.readinto(view[filled:])
+                    if not read:
+                        break
+                    filled += read
+            except (AttributeError, ValueError, OSError):
+                return False, None
+            return filled == self.frame_size, None
+
+        data = source.read()
+        if not data:
+            return False, None
+        if source.is_opus():
+            return True, data
+        if len(data) != self.frame_size:
+            return False, None
+        self._views[index][:] = data
+        return True, None
+
+    def _fill(self) -> None:
+        while True:
+            with self._condition:
+                while not self._closed and (self._eof or not self._has_space()):
+                    self._condition.wait()
+                if self._closed:
+                    return
+                source, generation = self._source, self._generation
+                index = self._written % self.depth
+
+            try:
+                read, packet = self._read_into(source, index)
+            except Exception:
+                read, packet = False, None
+
+            with self._condition:
+                if generation != self._generation:
+                    continue
+                if read:
+                    self._packets[index] = packet
+                    self._written += 1
+                else:
+                    self._eof = True
+                self._condition.notify_all()
@@ -0,0 +1,228 @@
+import asyncio
+import json
+import threading
+import time
+from attrs import asdict, define, evolve, field
+from collections import Counter
+from typing import Iterator, Optional
+
+
+__all__ = [
+    'HistoryEvent',
+    'GuildStats',
+    'PlayHistory'
+]
+
+
+@define(kw_only=True)
+class HistoryEvent:
+    """
+    Something which happened to a track.
+
+    Attributes
+    ----------
+    kind: `str`
+        One of add, start, end, skip, stop and remove, stop meaning the bot left mid track
+    guild_id: `int`
+        The guild the event happened in
+    key: `str`
+        The id of the track
+    title: `str`
+        The title of the track
+    channel_name: `str`
+        The name of the track's uploader
+    page_url: `str`
+        URL to the page of the track
+    position: `float`
+        Seconds of the track played when the event happened
+    timestamp: `float`
+        Unix time of the event
+    """
+
+    kind: str
+    guild_id: int
+    key: str
+    title: str
+    channel_name: str = ''
+    page_url: str = ''
+    position: float = 0.0
+    timestamp: float = field(factory=time.time)
+
+
+@define
+class GuildStats:
+    """
+    Aggregates of the events of a guild, or of every guild.
+
+    Attributes
+    ----------
+    plays: `int`
+        The amount of tracks started
+    skips: `int`
+        The amount of tracks skipped before their end
+    removals: `int`
+        The amount of tracks removed from the queue
+    seconds: `float`
+        Seconds of tracks played in total
+    tracks: `Counter[str]`
+        The amount of plays of every track
+    """
+
+    plays: int = 0
+    skips: int = 0
+    removals: int = 0
+    seconds: float = 0.0
+    tracks: Counter[str] = field(factory=Counter)
+
+    def add(self, event: HistoryEvent) -> None:
+        if event.kind == 'start':
+            self.plays += 1
+            self.tracks[event.key] += 1
+        elif event.kind == 'remove':
+            self.removals += 1
+        elif event.kind in ('end', 'skip', 'stop'):
+            self.seconds += event.position
+            self.skips += event.kind == 'skip'
+
+
+class PlayHistory:
+    """
+    An append-only log of track events with aggregates kept up to date in memory.
+
+    Recorded events are buffered and appended to a JSON lines file in batches
+    by a flush loop, so recording never waits for the disk. The aggregates are
+    updated when an event is recorded, the log is only read by `load`.
+
+    Parameters
+    ----------
+    path: `str`
+        The JSON lines file events are appended to
+    flush_interval: `float`
+        Seconds between two flushes
+    max_buffered: `int`
+        The amount of buffered events which triggers a flush before the interval passes
+
+    Attributes
+    ----------
+    events_written: `int`
+        The amount of events appended to the file
+    flushes: `int`
+        The amount of batches appended to the file
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        flush_interval: float = 10.0,
+        max_buffered: int = 1000
+    ) -> None:
+        self._path = path
+        self._flush_interval = flush_interval
+        self._max_buffered = max_buffered
+        self._lock = threading.Lock()
+        self._buffer: list[HistoryEvent] = []
+        self._write_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._total = GuildStats()
+        self._guilds: dict[int, GuildStats] = {}
+        self._titles: dict[str, str] = {}
+        self.events_written = 0
+        self.flushes = 0
+
+    def load(self) -> Iterator[HistoryEvent]:
+        """Aggregate every event already in the file and yield it, blocks while reading."""
+        try:
+            log = open(self._path, 'r')
+        except FileNotFoundError:
+            return
+        with log:
+            for line in log:
+                try:
+                    event = HistoryEvent(**json.loads(line))
+                except (TypeError, ValueError):
+                    # a line cut off by a crash
+                    continue
+                with self._lock:
+                    self._aggregate(event)
+                yield event
+
+    def record(self, event: HistoryEvent) -> None:
+        """Buffer an event and update the aggregates, can be called from any thread."""
+        with self._lock:
+            self._buffer.append(event)
+            self._aggregate(event)
+            full = len(self._buffer) >= self._max_buffered
+        if full and self._task is not None:
+            self._task.get_loop().call_soon_threadsafe(self._wakeup.set)
+
+    def _aggregate(self, event: HistoryEvent) -> None:
+        self._total.add(event)
+        self._guilds.setdefault(event.guild_id, GuildStats()).add(event)
+        self._titles[event.key] = event.title
+
+    def stats(self, guild_id: Optional[int] = None) -> GuildStats:
+        """A copy of the aggregates of a guild, or of every guild if `guild_id` is None."""
+        with self._lock:
+            stats = self._stats(guild_id)
+            return evolve(stats, tracks=stats.tracks.copy())
+
+    def top(self, guild_id: Optional[int] = None, *, limit: int = 10) -> list[tuple[str, int]]:
+        """The titles and play counts of the most played tracks."""
+        with self._lock:
+            return [
+                (self._titles[key], plays)
+                for key, plays in self._stats(guild_id).tracks.most_common(limit)
+            ]
+
+    def _stats(self, guild_id: Optional[int]) -> GuildStats:
+        if guild_id is None:
+            return self._total
+        return self._guilds.get(guild_id, GuildStats())
+
+    def start(self) -> None:
+        """Start the flush loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and flush the remaining events."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Append the buffered events to the file."""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        lines = ''.join(json.dumps(asdict(event)) + '\n' for event in batch)
+        try:
+            async with self._write_lock:
+                await asyncio.get_running_loop().run_in_executor(None, self._append, lines)
+        except OSError:
+            # keep the events for the next flush
+            with self._lock:
+                self._buffer[:0] = batch
+            raise
+        self.events_written += len(batch)
+        self.flushes += 1
+
+    def _append(self, lines: str) -> None:
+        with open(self._path, 'a') as log:
+            log.write(lines)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except OSError as err:
+                print(f'Failed to write play history: {err!r}')
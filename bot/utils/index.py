@@ -0,0 +1,111 @@
+import heapq
+from collections import Counter
+from typing import Generic, Hashable, Iterable, Optional, TypeVar
+
+
+__all__ = [
+    'SearchIndex'
+]
+
+
+T = TypeVar('T')
+
+
+def _words(text: str) -> list[str]:
+    return ''.join(char if char.isalnum() else ' ' for char in text.casefold()).split()
+
+
+def _trigrams(text: str) -> set[str]:
+    text = f' {" ".join(_words(text))} '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex(Generic[T]):
+    """
+    An in-memory index for searching items by the words of their texts.
+
+    Items are found by word prefixes, every word of a query has to be the
+    prefix of a word of the item. Queries matching no item that way fall back
+    to trigram similarity, which tolerates typos and partial words.
+    Results are ranked by how often an item was added.
+
+    Parameters
+    ----------
+    max_prefix: `int`
+        The length of the longest indexed word prefix
+    """
+
+    def __init__(self, *, max_prefix: int = 16) -> None:
+        self._max_prefix = max_prefix
+        self._items: dict[Hashable, T] = {}
+        self._counts: Counter[Hashable] = Counter()
+        self._prefixes: dict[str, set[Hashable]] = {}
+        self._trigrams: dict[str, set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def add(self, key: Hashable, item: T, texts: Iterable[str], *, count: int = 1) -> None:
+        """
+        Add `count` occurrences of the item identified by `key`.
+
+        The item replaces the one previously added under `key`, its texts are
+        only indexed the first time the key is added.
+        """
+        if key not in self._items:
+            texts = list(texts)
+            for text in texts:
+                for word in _words(text):
+                    for length in range(1, min(len(word), self._max_prefix) + 1):
+                        self._prefixes.setdefault(word[:length], set()).add(key)
+            for trigram in set().union(*map(_trigrams, texts)):
+                self._trigrams.setdefault(trigram, set()).add(key)
+        self._items[key] = item
+        self._counts[key] += count
+
+    def get(self, key: Hashable) -> Optional[T]:
+        """Get the item identified by `key`, None if it wasn't added."""
+        return self._items.get(key)
+
+    def count(self, key: Hashable) -> int:
+        """How often the item identified by `key` was added."""
+        return self._counts[key]
+
+    def _prefix_matches(self, words: list[str]) -> set[Hashable]:
+        matches = None
+        for word in sorted(words, key=len, reverse=True):
+            keys = self._prefixes.get(word[:self._max_prefix], set())
+            matches = keys.copy() if matches is None else matches & keys
+            if not matches:
+                return set()
+        return matches
+
+    def _trigram_matches(self, query: str) -> dict[Hashable, int]:
+        shared: Counter[Hashable] = Counter()
+        trigrams = _trigrams(query)
+        for trigram in trigrams:
+            shared.update(self._trigrams.get(trigram, ()))
+        threshold = max(1, len(trigrams) // 2)
+        return {key: amount for key, amount in shared.items() if amount >= threshold}
+
+    def search(self, query: str, *, limit: int = 25) -> list[T]:
+        """Get up to `limit` items matching the query, most added first."""
+        words = _words(query)
+        if not words:
+            keys = heapq.nlargest(limit, self._counts, key=self._counts.__getitem__)
+            return [self._items[key] for key in keys]
+
+        matches = self._prefix_matches(words)
+        if matches:
+            keys = heapq.nlargest(limit, matches, key=self._counts.__getitem__)
+        else:
+            similar = self._trigram_matches(query)
+            keys = heapq.nlargest(
+                limit,
+                similar,
+                key=lambda key: (similar[key], self._counts[key])
+            )
+        return [self._items[key] for key in keys]
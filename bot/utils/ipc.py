@@ -0,0 +1,121 @@
+import itertools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Optional
+
+
+__all__ = [
+    'IPCError',
+    'IPCChannel'
+]
+
+
+class IPCError(Exception):
+    pass
+
+
+class IPCChannel:
+    """
+    Request/reply messaging over a `multiprocessing` connection.
+
+    Both ends of a connection can send requests, every request gets a reply
+    with the handler's return value or the exception it raised.
+    Requests are handled on a thread pool so a handler can make requests of
+    its own without blocking incoming replies.
+
+    Parameters
+    ----------
+    connection: `multiprocessing.connection.Connection`
+        The connection to the other process
+    handler: `Callable[[str, Any], Any]`
+        A function called with the operation and data of incoming requests
+    on_close: `Optional[Callable[[], Any]]`
+        A function run when the connection closes
+    """
+
+    def __init__(
+        self,
+        connection: Connection,
+        handler: Callable[[str, Any], Any],
+        *,
+        on_close: Optional[Callable[[], Any]] = None
+    ) -> None:
+        self._connection = connection
+        self._handler = handler
+        self._on_close = on_close
+        self._send_lock = threading.Lock()
+        self._ids = itertools.count()
+        self._pending: dict[int, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=4)
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self.closed = False
+
+    def start(self) -> None:
+        """Start reading messages."""
+        self._reader.start()
+
+    def close(self) -> None:
+        """Close the connection, pending requests fail with `IPCError`."""
+        if self.closed:
+            return
+        self.closed = True
+        self._connection.close()
+        for future in self._pending.values():
+            future.set_exception(IPCError('Connection closed'))
+        self._pending.clear()
+        self._executor.shutdown(wait=False)
+        if self._on_close is not None:
+            self._on_close()
+
+    def _send(self, message: dict[str, Any]) -> None:
+        with self._send_lock:
+            self._connection.send(message)
+
+    def request(self, op: str, data: Any = None) -> Future:
+        """Send a request, the returned future resolves with the reply."""
+        if self.closed:
+            raise IPCError('Connection closed')
+        future = Future()
+        request_id = next(self._ids)
+        self._pending[request_id] = future
+        try:
+            self._send({'id': request_id, 'op': op, 'data': data})
+        except (OSError, EOFError) as err:
+            self._pending.pop(request_id, None)
+            raise IPCError('Connection closed') from err
+        return future
+
+    def _handle(self, request_id: int, op: str, data: Any) -> None:
+        try:
+            reply = {'reply_to': request_id, 'result': self._handler(op, data)}
+        except Exception as err:
+            reply = {'reply_to': request_id, 'error': f'{type(err).__name__}: {err}'}
+        try:
+            self._send(reply)
+        except (OSError, EOFError):
+            pass
+
+    def _read(self) -> None:
+        try:
+            while True:
+                message = self._connection.recv()
+                if 'reply_to' in message:
+                    future = self._pending.pop(message['reply_to'], None)
+                    if future is None:
+                        continue
+                    if 'error' in message:
+                        future.set_exception(IPCError(message['error']))
+                    else:
+                        future.set_result(message['result'])
+                else:
+                    self._executor.submit(
+                        self._handle,
+                        message['id'],
+                        message['op'],
+                        message['data']
+                    )
+        except (OSError, EOFError):
+            pass
+        finally:
+            self.close()
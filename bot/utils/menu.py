@@ -1,4 +1,6 @@
+import asyncio
 import discord
+import time
 from discord import Interaction
 from discord.ui import (
     Button,
@@ -7,6 +9,7 @@ from discord.ui import (
     View,
     button
 )
+from typing import ClassVar, Optional
 
 
 __all__ = [
@@ -38,6 +41,10 @@ class ListMenu(View):
 
     The text displayed is gathered through the items' str implementations.
 
+    Page changes are rate limited, the embed is edited at most once every
+    `edit_interval` seconds. Page changes requested in between are
+    acknowledged right away and coalesced into one edit to the latest page.
+
     Parameters
     ----------
     items: `Iterable[T]`
@@ -50,8 +57,20 @@ class ListMenu(View):
         The amount of items to display per page
     timeout: `Optional[float]`
         See `discord.ui.View.timeout`
+    edit_interval: `float`
+        The minimum amount of seconds between two edits of the embed
+
+    Attributes
+    ----------
+    edits_applied: `int`
+        The amount of embed edits sent to discord
+    edits_saved: `int`
+        The amount of page changes which didn't need their own edit
     """
 
+    total_edits_applied: ClassVar[int] = 0
+    total_edits_saved: ClassVar[int] = 0
+
     def __init__(
         self,
         items: list[str],
@@ -60,7 +79,8 @@ class ListMenu(View):
         title: str,
         description: str,
         per_page: int = 15,
-        timeout: float = 180
+        timeout: float = 180,
+        edit_interval: float = 1.0
     ) -> None:
         super().__init__(timeout=timeout)
         self._embed = discord.Embed(
@@ -72,6 +92,13 @@ class ListMenu(View):
         self._basic_desc = description + ' \n\n '
         self._per_page = per_page
         self._page = -1
+        self._target = -1
+        self._edit_interval = edit_interval
+        self._last_edit = 0.0
+        self._pending: Optional[Interaction] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self.edits_applied = 0
+        self.edits_saved = 0
 
     @property
     def max_pages(self) -> int:
@@ -91,19 +118,70 @@ class ListMenu(View):
         self._embed.description = self._basic_desc + '\n'.join(items)
         self._embed.set_footer(text=f'{self._page + 1}/{self.max_pages}')
 
+    def _count_applied(self) -> None:
+        self.edits_applied += 1
+        ListMenu.total_edits_applied += 1
+
+    def _count_saved(self) -> None:
+        self.edits_saved += 1
+        ListMenu.total_edits_saved += 1
+
+    async def _flush(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        interaction, self._pending = self._pending, None
+        self._flush_task = None
+        if self._target == self._page:
+            self._count_saved()
+            return
+        self._last_edit = time.monotonic()
+        self._update_page(self._target)
+        self._count_applied()
+        await interaction.edit_original_message(embed=self._embed)
+
     async def edit(self, interaction: Interaction, *, page: int) -> None:
-        """Edit the menu's page and the discord embed."""
-        page = min(max(0, page), self.max_pages - 1)
-        self._update_page(page)
-        await interaction.response.edit_message(embed=self._embed)
+        """
+        Edit the menu's page and the discord embed.
+
+        If the last edit was less than `edit_interval` seconds ago the
+        interaction is deferred and the edit is applied once the interval passes.
+        """
+        self._target = min(max(0, page), self.max_pages - 1)
+        now = time.monotonic()
+        if self._flush_task is None and self._target == self._page:
+            await interaction.response.defer()
+            self._count_saved()
+            return
+        if self._flush_task is None and now - self._last_edit >= self._edit_interval:
+            self._last_edit = now
+            self._update_page(self._target)
+            self._count_applied()
+            await interaction.response.edit_message(embed=self._embed)
+            return
+
+        await interaction.response.defer()
+        if self._pending is not None:
+            self._count_saved()
+        self._pending = interaction
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(
+                self._flush(self._last_edit + self._edit_interval - now)
+            )
 
     async def start(self, interaction: Interaction) -> None:
         """Start the view."""
         if interaction.response.is_done():
             raise RuntimeError('Menu can only be started once')
+        self._target = 0
+        self._last_edit = time.monotonic()
         self._update_page(0)
         await interaction.response.send_message(embed=self._embed, view=self)
 
+    async def on_timeout(self) -> None:
+        """Drop any pending edit."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+
     async def interaction_check(self, interaction: Interaction) -> bool:
         """Fails if menu owner and interaction user are different."""
         if interaction.user == self.owner:
@@ -127,7 +205,7 @@ class ListMenu(View):
         interaction: Interaction,
         button: Button
     ) -> None:
-        await self.edit(interaction, page=self._page - 1)
+        await self.edit(interaction, page=self._target - 1)
 
     @button(label='Page')
     async def _change_page(
@@ -143,7 +221,7 @@ class ListMenu(View):
         interaction: Interaction,
         button: Button
     ) -> None:
-        await self.edit(interaction, page=self._page + 1)
+        await self.edit(interaction, page=self._target + 1)
 
     @button(label='»')
     async def _last_page(
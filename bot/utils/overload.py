@@ -0,0 +1,147 @@
+import asyncio
+import enum
+from typing import Any, Callable, Optional
+
+
+__all__ = [
+    'OverloadLevel',
+    'OverloadController'
+]
+
+
+class OverloadLevel(enum.IntEnum):
+    """Graded overload measures, every level includes the measures of the levels below it."""
+
+    NORMAL = 0
+    REDUCE_QUALITY = 1
+    PAUSE_BACKGROUND = 2
+    REFUSE_SESSIONS = 3
+    SHED_LOAD = 4
+
+
+class OverloadController:
+    """
+    Tracks how overloaded the process is from frame lateness.
+
+    Every `interval` seconds the controller samples the total amount of sent
+    and late frames. The pressure is the late frame ratio relative to
+    `late_target`. Pressure above 1 for `escalate_after` samples
+    raises the level by one, pressure below `recover_below` for
+    `recover_after` samples lowers it by one.
+
+    `on_change` is called with the previous and the new level on every change.
+    It's also called with the same level twice when the pressure stays too
+    high at the highest level, or relaxed below it, so load can be shed and
+    restored gradually.
+
+    CPU usage isn't taken into account, with the GIL the process falls behind
+    long before its cores are busy and late frames are what listeners notice.
+
+    Parameters
+    ----------
+    sample: `Callable[[], tuple[int, int]]`
+        A function returning the total amount of sent and late frames
+    on_change: `Optional[Callable[[OverloadLevel, OverloadLevel], Any]]`
+        A function run when the level changes
+    interval: `float`
+        Seconds between two samples
+    late_target: `float`
+        The highest acceptable ratio of late frames
+    escalate_after: `int`
+        The amount of overloaded samples before the level is raised
+    recover_after: `int`
+        The amount of relaxed samples before the level is lowered
+    recover_below: `float`
+        The pressure below which a sample counts as relaxed
+
+    Attributes
+    ----------
+    level: `OverloadLevel`
+        The current level
+    pressure: `float`
+        The pressure of the last sample
+    late_ratio: `float`
+        The ratio of late frames of the last sample
+    """
+
+    def __init__(
+        self,
+        sample: Callable[[], tuple[int, int]],
+        *,
+        on_change: Optional[Callable[[OverloadLevel, OverloadLevel], Any]] = None,
+        interval: float = 1.0,
+        late_target: float = 0.05,
+        escalate_after: int = 3,
+        recover_after: int = 15,
+        recover_below: float = 0.5
+    ) -> None:
+        self._sample = sample
+        self.on_change = on_change
+        self._interval = interval
+        self._late_target = late_target
+        self._escalate_after = escalate_after
+        self._recover_after = recover_after
+        self._recover_below = recover_below
+        self._task: Optional[asyncio.Task] = None
+        self._overloaded = 0
+        self._relaxed = 0
+        self._last: Optional[tuple[int, int]] = None
+        self.level = OverloadLevel.NORMAL
+        self.pressure = 0.0
+        self.late_ratio = 0.0
+
+    def start(self) -> None:
+        """Start sampling."""
+        if self._task is None:
+            self._last = None
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        """Stop sampling."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def update(self) -> OverloadLevel:
+        """Take a sample and change the level if needed."""
+        frames, late = self._sample()
+        if self._last is None:
+            self._last = frames, late
+            return self.level
+        last_frames, last_late = self._last
+        self._last = frames, late
+
+        sent = frames - last_frames
+        self.late_ratio = (late - last_late) / sent if sent > 0 else 0.0
+        self.pressure = self.late_ratio / self._late_target
+
+        if self.pressure > 1:
+            self._relaxed = 0
+            self._overloaded += 1
+            if self._overloaded >= self._escalate_after:
+                self._overloaded = 0
+                self._set_level(min(self.level + 1, OverloadLevel.SHED_LOAD))
+        elif self.pressure < self._recover_below:
+            self._overloaded = 0
+            self._relaxed += 1
+            if self._relaxed >= self._recover_after and self.level > OverloadLevel.NORMAL:
+                self._relaxed = 0
+                self._set_level(self.level - 1)
+            elif self.level < OverloadLevel.SHED_LOAD:
+                self._set_level(self.level)
+        else:
+            self._overloaded = self._relaxed = 0
+        return self.level
+
+    def _set_level(self, level: int) -> None:
+        previous, self.level = self.level, OverloadLevel(level)
+        if self.on_change is not None:
+            self.on_change(previous, self.level)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                self.update()
+            except Exception as err:
+                print(f'Overload controller failed: {err!r}')
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from attrs import define, field
+from collections import Counter
+from types import CodeType
+
+
+__all__ = [
+    'ProfileReport',
+    'SamplingProfiler'
+]
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[max(0, min(len(values) - 1, round(percent / 100 * len(values)) - 1))]
+
+
+@define
+class ProfileReport:
+    """
+    The results of a profile.
+
+    Attributes
+    ----------
+    seconds: `float`
+        How long the profile ran
+    samples: `int`
+        The amount of times every thread was sampled
+    stacks: `Counter[str]`
+        The amount of samples of every collapsed stack, rooted at the thread name
+    thread_cpu: `dict[str, float]`
+        CPU seconds used by every thread while profiling, by thread name,
+        empty where per thread CPU clocks aren't available
+    functions: `Counter[str]`
+        The amount of samples every function was running in, not counting callees
+    loop_lag: `list[float]`
+        Seconds the event loop was late to wake up a sleeping task, once per lag sample
+    slow_callbacks: `list[str]`
+        The slow callback warnings logged by asyncio while profiling,
+        empty unless the profile ran in debug mode
+    """
+
+    seconds: float = 0.0
+    samples: int = 0
+    stacks: Counter[str] = field(factory=Counter)
+    thread_cpu: dict[str, float] = field(factory=dict)
+    functions: Counter[str] = field(factory=Counter)
+    loop_lag: list[float] = field(factory=list)
+    slow_callbacks: list[str] = field(factory=list)
+
+    def write_collapsed(self, path: str) -> None:
+        """Write the stacks in the collapsed format read by flamegraph.pl and speedscope."""
+        with open(path, 'w') as collapsed:
+            for stack, count in self.stacks.most_common():
+                collapsed.write(f'{stack} {count}\n')
+
+    def lag_percentiles(self) -> tuple[float, float, float]:
+        """The p50, p99 and max event loop lag in seconds."""
+        return (
+            _percentile(self.loop_lag, 50),
+            _percentile(self.loop_lag, 99),
+            max(self.loop_lag, default=0.0)
+        )
+
+
+class _SlowCallbackHandler(logging.Handler):
+    def __init__(self, report: ProfileReport) -> None:
+        super().__init__(logging.WARNING)
+        self._report = report
+
+    def emit(self, record: logging.LogRecord) -> None:
+        message = record.getMessage()
+        if message.startswith('Executing '):
+            self._report.slow_callbacks.append(message)
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread to find where the process spends its time.
+
+    A sampler thread reads the current frame of every thread every `interval`
+    seconds. Samples are taken whether a thread is running or waiting, the
+    CPU time of every thread is measured separately to tell which are busy.
+    At the same time a task measures how late the event loop wakes it up.
+    Asyncio debug mode, which logs callbacks running longer than
+    `slow_callback` seconds but slows down every callback, is only enabled
+    when asked for.
+
+    Parameters
+    ----------
+    interval: `float`
+        Seconds between two samples
+    lag_interval: `float`
+        Seconds between two event loop lag samples
+    slow_callback: `float`
+        Callbacks running longer than this are reported as slow
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float = 0.01,
+        lag_interval: float = 0.05,
+        slow_callback: float = 0.05
+    ) -> None:
+        self._interval = interval
+        self._lag_interval = lag_interval
+        self._slow_callback = slow_callback
+        self._labels: dict[CodeType, str] = {}
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def _label(self, code: CodeType) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = (
+                f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+            )
+        return label
+
+    def _sample(self, report: ProfileReport, names: dict[int, str], own: int) -> None:
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(self._label(frame.f_code))
+                frame = frame.f_back
+            thread = names.get(ident, f'thread-{ident}')
+            labels.append(thread)
+            report.stacks[';'.join(reversed(labels))] += 1
+            report.functions[labels[0]] += 1
+        report.samples += 1
+
+    @staticmethod
+    def _thread_cpu() -> dict[int, tuple[str, float]]:
+        if not hasattr(time, 'pthread_getcpuclockid'):
+            return {}
+        cpu = {}
+        for thread in threading.enumerate():
+            try:
+                clock = time.pthread_getcpuclockid(thread.ident)
+                cpu[thread.ident] = thread.name, time.clock_gettime(clock)
+            except (OSError, TypeError):
+                # the thread exited or didn't start yet
+                pass
+        return cpu
+
+    def _run_sampler(self, report: ProfileReport, seconds: float) -> None:
+        own = threading.get_ident()
+        end = time.perf_counter() + seconds
+        cpu_before = self._thread_cpu()
+        while time.perf_counter() < end:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            self._sample(report, names, own)
+            time.sleep(self._interval)
+        for ident, (name, cpu) in self._thread_cpu().items():
+            if ident != own:
+                used = cpu - cpu_before.get(ident, (name, 0.0))[1]
+                report.thread_cpu[name] = report.thread_cpu.get(name, 0.0) + used
+
+    async def _measure_lag(self, report: ProfileReport) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self._lag_interval)
+            report.loop_lag.append(max(0.0, loop.time() - start - self._lag_interval))
+
+    async def profile(self, seconds: float, *, debug: bool = False) -> ProfileReport:
+        """
+        Profile every thread and the running event loop for `seconds`.
+
+        If `debug` is True asyncio debug mode is enabled meanwhile to report
+        slow callbacks, at the cost of skewing the rest of the profile.
+        """
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            report = ProfileReport()
+            handler = _SlowCallbackHandler(report)
+            asyncio_logger = logging.getLogger('asyncio')
+            was_debug, slow_callback = loop.get_debug(), loop.slow_callback_duration
+            if debug:
+                asyncio_logger.addHandler(handler)
+                loop.slow_callback_duration = self._slow_callback
+                loop.set_debug(True)
+            lag = asyncio.create_task(self._measure_lag(report))
+            start = time.perf_counter()
+            try:
+                await loop.run_in_executor(None, self._run_sampler, report, seconds)
+            finally:
+                report.seconds = time.perf_counter() - start
+                lag.cancel()
+                if debug:
+                    loop.set_debug(was_debug)
+                    loop.slow_callback_duration = slow_callback
+                    asyncio_logger.removeHandler(handler)
+            return report
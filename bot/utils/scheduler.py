@@ -0,0 +1,170 @@
+import asyncio
+import discord
+import json
+import time
+from attrs import define
+from typing import Any, Callable, Hashable, Optional
+
+
+__all__ = [
+    'EditScheduler'
+]
+
+
+@define
+class _Entry:
+    message: discord.Message
+    render: Callable[[], dict[str, Any]]
+    refresh: Optional[float]
+    dirty: bool = True
+    last_edit: float = 0.0
+    last_render: float = 0.0
+    digest: Optional[str] = None
+
+
+def _digest(kwargs: dict[str, Any]) -> str:
+    return json.dumps(
+        {
+            key: value.to_dict() if isinstance(value, discord.Embed) else value
+            for key, value in kwargs.items()
+        },
+        sort_keys=True,
+        default=str
+    )
+
+
+class EditScheduler:
+    """
+    Applies message edits of many messages from a single rate limited loop.
+
+    Messages are registered with a render function returning the keyword
+    arguments for `discord.Message.edit`. A message is re-rendered when marked
+    dirty or when its refresh period passes, and only edited if the rendered
+    content changed.
+
+    Parameters
+    ----------
+    interval: `float`
+        Seconds between two batches of edits
+    max_per_tick: `int`
+        The maximum amount of edits sent per batch
+    min_edit_interval: `float`
+        The minimum amount of seconds between two edits of the same message
+
+    Attributes
+    ----------
+    edits_sent: `int`
+        The amount of edits sent to discord
+    edits_skipped: `int`
+        The amount of renders which didn't change the message
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float = 1.0,
+        max_per_tick: int = 5,
+        min_edit_interval: float = 5.0
+    ) -> None:
+        self._interval = interval
+        self._max_per_tick = max_per_tick
+        self._min_edit_interval = min_edit_interval
+        self._entries: dict[Hashable, _Entry] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.edits_sent = 0
+        self.edits_skipped = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def register(
+        self,
+        key: Hashable,
+        message: discord.Message,
+        render: Callable[[], dict[str, Any]],
+        *,
+        refresh: Optional[float] = None
+    ) -> None:
+        """
+        Start managing edits of `message` under `key`.
+
+        `message` is expected to show what `render` returns at registration,
+        so it isn't edited until that changes. Replaces the message previously
+        registered under the same key.
+        """
+        now = time.monotonic()
+        self._entries[key] = _Entry(
+            message,
+            render,
+            refresh,
+            dirty=False,
+            last_edit=now,
+            last_render=now,
+            digest=_digest(render())
+        )
+
+    def unregister(self, key: Hashable) -> None:
+        """Stop managing the message registered under `key`."""
+        self._entries.pop(key, None)
+
+    def mark_dirty(self, key: Hashable) -> None:
+        """
+        Re-render the message registered under `key` on the next batch.
+
+        Not thread safe, use `loop.call_soon_threadsafe` from other threads.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.dirty = True
+
+    def start(self) -> None:
+        """Start the edit loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        """Stop the edit loop."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _due(self, now: float) -> list[tuple[Hashable, _Entry]]:
+        due = [
+            (key, entry) for key, entry in self._entries.items()
+            if now - entry.last_edit >= self._min_edit_interval and (
+                entry.dirty
+                or entry.refresh is not None and now - entry.last_render >= entry.refresh
+            )
+        ]
+        due.sort(key=lambda item: (not item[1].dirty, item[1].last_edit))
+        return due[:self._max_per_tick]
+
+    async def _edit(self, key: Hashable, entry: _Entry, now: float) -> None:
+        entry.dirty = False
+        entry.last_render = now
+        kwargs = entry.render()
+        digest = _digest(kwargs)
+        if digest == entry.digest:
+            self.edits_skipped += 1
+            return
+        entry.digest = digest
+        entry.last_edit = now
+        try:
+            await entry.message.edit(**kwargs)
+        except discord.NotFound:
+            # another message may have been registered under the key meanwhile
+            if self._entries.get(key) is entry:
+                self.unregister(key)
+        else:
+            self.edits_sent += 1
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            now = time.monotonic()
+            batch = self._due(now)
+            if batch:
+                await asyncio.gather(
+                    *(self._edit(key, entry, now) for key, entry in batch),
+                    return_exceptions=True
+                )
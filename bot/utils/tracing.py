@@ -0,0 +1,231 @@
+import asyncio
+import json
+import time
+from attrs import define, field
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Deque, Hashable, Optional
+
+
+__all__ = [
+    'Span',
+    'Trace',
+    'Tracer',
+    'TRACER'
+]
+
+
+@define
+class Span:
+    """
+    A timed part of a trace.
+
+    Attributes
+    ----------
+    name: `str`
+        The name of the span
+    start: `float`
+        Seconds from the start of the trace to the start of the span
+    duration: `float`
+        The duration of the span in seconds
+    """
+
+    name: str
+    start: float
+    duration: float
+
+
+@define
+class Trace:
+    """
+    The spans of a single command invocation.
+
+    Attributes
+    ----------
+    name: `str`
+        The name of the traced command
+    start: `float`
+        The `time.perf_counter` value at the start of the trace
+    timestamp: `float`
+        The `time.time` value at the start of the trace
+    duration: `Optional[float]`
+        The duration of the trace in seconds, None until finished
+    status: `str`
+        How the traced command finished
+    spans: `list[Span]`
+        The spans recorded during the trace
+    """
+
+    name: str
+    start: float = field(factory=time.perf_counter)
+    timestamp: float = field(factory=time.time)
+    duration: Optional[float] = None
+    status: str = 'ok'
+    spans: list[Span] = field(factory=list)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'name': self.name,
+            'time': self.timestamp,
+            'duration': self.duration,
+            'status': self.status,
+            'spans': [
+                {'name': span.name, 'start': span.start, 'duration': span.duration}
+                for span in self.spans
+            ]
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar('_current_trace', default=None)
+
+
+class _SpanContext:
+    __slots__ = ('_name', '_trace', '_start')
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+
+    def __enter__(self) -> None:
+        self._trace = _current_trace.get()
+        self._start = time.perf_counter()
+
+    def __exit__(self, *_) -> None:
+        if self._trace is not None:
+            end = time.perf_counter()
+            self._trace.spans.append(
+                Span(self._name, self._start - self._trace.start, end - self._start)
+            )
+
+    async def __aenter__(self) -> None:
+        self.__enter__()
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.__exit__(*exc_info)
+
+
+def _percentiles(values: list[float]) -> tuple[float, float, float]:
+    values = sorted(values)
+    return tuple(
+        values[max(0, min(len(values) - 1, round(percent / 100 * len(values)) - 1))]
+        for percent in (50, 95, 99)
+    )
+
+
+class Tracer:
+    """
+    Records traces of commands in a rolling buffer and optionally a JSON lines file.
+
+    A trace is started with `begin`, which makes it the current trace of the
+    running task, spans opened with `span` in that task are added to it.
+    Spans opened outside of a trace are ignored. Finished traces are appended
+    to the file in batches from an executor, so finishing a trace never waits
+    for the disk.
+
+    Parameters
+    ----------
+    size: `int`
+        The amount of finished traces kept in memory
+    """
+
+    def __init__(self, *, size: int = 5000) -> None:
+        self._traces: Deque[Trace] = deque(maxlen=size)
+        self._open: dict[Hashable, Trace] = {}
+        self._max_open = size
+        self._path: Optional[str] = None
+        self._flush_interval = 5.0
+        self._pending: list[Trace] = []
+        self._write_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def open(self, path: str, *, flush_interval: float = 5.0) -> None:
+        """
+        Also append finished traces to the JSON lines file at `path`.
+
+        Starts a loop flushing the finished traces every `flush_interval`
+        seconds, must be called from the event loop.
+        """
+        self._path = path
+        self._flush_interval = flush_interval
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the flush loop and flush the remaining traces."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Append the finished traces to the file."""
+        batch, self._pending = self._pending, []
+        if not batch or self._path is None:
+            return
+        async with self._write_lock:
+            await asyncio.get_running_loop().run_in_executor(None, self._append, batch)
+
+    def _append(self, batch: list[Trace]) -> None:
+        with open(self._path, 'a') as log:
+            log.write(''.join(json.dumps(trace.to_dict()) + '\n' for trace in batch))
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                await self.flush()
+            except OSError as err:
+                print(f'Failed to write traces: {err!r}')
+
+    def begin(self, key: Hashable, name: str) -> Trace:
+        """Start a trace identified by `key` and make it the current trace."""
+        if len(self._open) >= self._max_open:
+            del self._open[next(iter(self._open))]
+        trace = self._open[key] = Trace(name)
+        _current_trace.set(trace)
+        return trace
+
+    def finish(self, key: Hashable, *, status: str = 'ok') -> Optional[Trace]:
+        """Finish the trace identified by `key`, returns None if there's no such trace."""
+        trace = self._open.pop(key, None)
+        if trace is None:
+            return None
+        trace.duration = time.perf_counter() - trace.start
+        trace.status = status
+        self._traces.append(trace)
+        if self._path is not None:
+            self._pending.append(trace)
+        return trace
+
+    def span(self, name: str) -> _SpanContext:
+        """Time a `with` or `async with` block as a span of the current trace."""
+        return _SpanContext(name)
+
+    def percentiles(
+        self,
+        name: Optional[str] = None
+    ) -> dict[str, dict[str, tuple[float, float, float]]]:
+        """
+        Get the p50, p95 and p99 durations of traces and their spans in seconds.
+
+        Returns a mapping of trace names to a mapping of span names to
+        percentiles, the duration of the whole trace is under the key `'total'`.
+        Only traces named `name` are included if it's given.
+        """
+        durations: dict[str, dict[str, list[float]]] = {}
+        for trace in self._traces:
+            if name is not None and trace.name != name:
+                continue
+            spans = durations.setdefault(trace.name, {})
+            spans.setdefault('total', []).append(trace.duration)
+            for span in trace.spans:
+                spans.setdefault(span.name, []).append(span.duration)
+        return {
+            trace_name: {
+                span_name: _percentiles(values)
+                for span_name, values in spans.items()
+            }
+            for trace_name, spans in durations.items()
+        }
+
+
+TRACER = Tracer()